@@ -0,0 +1,45 @@
+"""Cost of accessing and parsing imeji timestamps.
+
+Compares `dateutil.parser.parse` (used for every access of a `*Date` attribute before),
+the fast path of `pyimeji.util.parse_date`, cached attribute access on a resource, and
+batch parsing of a listing with `pyimeji.util.parse_dates`.
+
+Usage::
+
+    $ python benchmarks/dates.py --number 20000
+"""
+from __future__ import print_function, division
+import argparse
+import timeit
+
+from dateutil.parser import parse
+
+from pyimeji.resource import Item
+from pyimeji.util import parse_date, parse_dates
+
+TIMESTAMP = '2014-11-20T10:31:15 +0100'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    item = Item({'id': 'x', 'modifiedDate': TIMESTAMP}, None)
+    entries = [{'modifiedDate': '2014-11-20T10:%02d:15 +0100' % (i % 60)}
+               for i in range(args.number)]
+    cases = [
+        ('dateutil.parser.parse', lambda: parse(TIMESTAMP)),
+        ('pyimeji.util.parse_date', lambda: parse_date(TIMESTAMP)),
+        ('Item.modifiedDate (cached)', lambda: item.modifiedDate),
+    ]
+    print('%-30s %12s' % ('', 'us/call'))
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print('%-30s %12.2f' % (name, seconds / args.number * 1e6))
+    seconds = min(timeit.repeat(lambda: parse_dates(entries), number=1, repeat=3))
+    print('%-30s %12.2f' % ('parse_dates (per entry)', seconds / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
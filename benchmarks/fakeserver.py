@@ -0,0 +1,219 @@
+"""An in-process stand-in for the REST API of an imeji instance, for benchmarks.
+
+The server holds one collection, album and profile with a configurable number of
+generated items, and implements what the client needs to list, retrieve, create and
+download items: paged listings with `totalNumberOfResults` (capping the page size like a
+real instance), multipart uploads - which are streamed and discarded - and file downloads.
+Each request can be delayed by a fixed latency.
+
+    >>> with FakeImeji(items=10000, latency=0.005) as server:
+    >>>     api = Imeji(service_url=server.url)
+"""
+from __future__ import print_function, division
+import re
+import json
+import time
+import hashlib
+import threading
+
+from six.moves.BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import urlparse, parse_qsl
+
+COLLECTION_ID = 'collection0'
+ALBUM_ID = 'album0'
+PROFILE_ID = 'profile0'
+CHUNK_SIZE = 64 * 1024
+TIMESTAMP = '2016-05-19T10:31:15 +0200'
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Accept bursts of connections from clients with large pools.
+    request_queue_size = 128
+
+
+class FakeImeji(object):
+    """The fake server, to be used as context manager."""
+
+    def __init__(self, items=1000, latency=0.0, payload=200, file_size=1024 * 1024,
+                 max_page_size=500):
+        """
+
+        :param items: Number of items in the collection and album.
+        :param latency: Seconds to wait before answering a request.
+        :param payload: Number of bytes of padding in the metadata of each item.
+        :param file_size: Number of bytes of the file of each item.
+        :param max_page_size: Maximal number of items returned per page.
+        """
+        self.latency = latency
+        self.file_size = file_size
+        self.max_page_size = max_page_size
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        block = bytes(bytearray(range(256))) * (CHUNK_SIZE // 256)
+        self._block = block
+        md5 = hashlib.md5()
+        for chunk in self.file_chunks():
+            md5.update(chunk)
+        self.checksum = md5.hexdigest()
+        self.items = [self._item('item%08d' % i, payload) for i in range(items)]
+        self.index = {d['id']: d for d in self.items}
+        self._server = None
+        self.url = None
+
+    def _item(self, id_, payload):
+        return {
+            'id': id_,
+            'collectionId': COLLECTION_ID,
+            'filename': '%s.tif' % id_,
+            'mimetype': 'image/tiff',
+            'checksumMd5': self.checksum,
+            'createdDate': TIMESTAMP,
+            'modifiedDate': TIMESTAMP,
+            'status': 'PENDING',
+            'metadata': {'description': 'x' * payload},
+            'fileUrl': None,
+        }
+
+    def file_chunks(self):
+        remaining = self.file_size
+        while remaining > 0:
+            chunk = self._block[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    def __enter__(self):
+        server = self
+
+        class Handler(_Handler):
+            fake = server
+
+        self._server = _HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%s' % self._server.server_address[1]
+        for d in self.items:
+            d['fileUrl'] = '%s/file/%s' % (self.url, d['id'])
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def page(self, query):
+        params = dict(parse_qsl(query))
+        offset = int(params.get('offset', 0))
+        size = min(int(params.get('size', 20)), self.max_page_size)
+        results = self.items[offset:offset + size]
+        return dict(
+            totalNumberOfResults=len(self.items),
+            numberOfResults=len(results),
+            offset=offset,
+            size=size,
+            results=results)
+
+    def get(self, path, query):
+        """:return: Pair (status, JSON object or None)."""
+        comps = path.strip('/').split('/')[1:]
+        if comps in (['collections'], ['albums'], ['profiles']):
+            return 200, [{'id': dict(collections=COLLECTION_ID, albums=ALBUM_ID,
+                                     profiles=PROFILE_ID)[comps[0]]}]
+        if comps == ['items']:
+            return 200, self.page(query)
+        if len(comps) == 2 and comps[0] == 'items':
+            item = self.index.get(comps[1])
+            return (200, item) if item else (404, {'error': {'title': 'not found'}})
+        if len(comps) == 2 and comps[0] in ('collections', 'albums', 'profiles'):
+            return 200, {'id': comps[1], 'title': 'Benchmark', 'createdDate': TIMESTAMP,
+                         'modifiedDate': TIMESTAMP}
+        if len(comps) == 3 and comps[0] in ('collections', 'albums') and comps[2] == 'items':
+            return 200, self.page(query)
+        return 404, {'error': {'title': 'not found'}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; avoid delayed ACKs stalling responses.
+    disable_nagle_algorithm = True
+    fake = None
+
+    def log_message(self, *args):
+        pass
+
+    def _delay(self):
+        with self.fake._lock:
+            self.fake.requests += 1
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+
+    def _json(self, status, obj):
+        body = json.dumps(obj).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._delay()
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self._delay()
+        url = urlparse(self.path)
+        if url.path.startswith('/file/'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(self.fake.file_size))
+            self.end_headers()
+            for chunk in self.fake.file_chunks():
+                self.wfile.write(chunk)
+            return
+        self._json(*self.fake.get(url.path, url.query))
+
+    def _drain(self):
+        """Read the request body, returning only its first chunk."""
+        remaining = int(self.headers.get('Content-Length') or 0)
+        first = b''
+        while remaining > 0:
+            chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            first = first or chunk
+            with self.fake._lock:
+                self.fake.bytes_received += len(chunk)
+        return first
+
+    def do_POST(self):
+        self._delay()
+        first = self._drain()
+        # The JSON part is the first part of the multipart body.
+        m = re.search(b'name="json"[^\\r]*\\r\\n\\r\\n(?P<json>.+?)\\r\\n--', first, re.DOTALL)
+        d = json.loads(m.group('json').decode('utf8')) if m else {}
+        d.setdefault('id', 'new%08d' % self.fake.requests)
+        d.setdefault('createdDate', TIMESTAMP)
+        d.setdefault('modifiedDate', TIMESTAMP)
+        self._json(201, d)
+
+    def do_PUT(self):
+        self._delay()
+        self._drain()
+        path = urlparse(self.path).path
+        if path.endswith('/unlink'):
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._json(200, {'id': path.rstrip('/').split('/')[-1], 'modifiedDate': TIMESTAMP})
+
+    def do_DELETE(self):
+        self._delay()
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
@@ -0,0 +1,49 @@
+"""Cost of decoding and encoding large JSON payloads with the available JSON backends.
+
+Times `pyimeji.util.loads` on a listing page built from copies of the item fixture and
+`pyimeji.util.dumps` on the decoded page, for each installed library in
+`pyimeji.util.JSON_BACKENDS`.
+
+Usage::
+
+    $ python benchmarks/json_backends.py --entries 10000
+"""
+from __future__ import print_function, division
+import argparse
+import json
+import timeit
+
+from pyimeji.util import JSON_BACKENDS, pkg_path, set_json_backend, loads, dumps
+
+
+def page(entries):
+    with open(pkg_path('tests', 'resources', 'item.json')) as fp:
+        item = json.load(fp)
+    return json.dumps(
+        [dict(item, id='item%08d' % i, filename='file%08d.tif' % i) for i in range(entries)]
+    ).encode('utf8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    data = page(args.entries)
+    obj = json.loads(data.decode('utf8'))
+    print('payload: %.1f MB' % (len(data) / 1024 / 1024))
+
+    print('%-10s %12s %12s' % ('backend', 'loads ms', 'dumps ms'))
+    for name in JSON_BACKENDS:
+        try:
+            set_json_backend(name)
+        except ImportError:
+            print('%-10s %12s' % (name, 'n/a'))
+            continue
+        load = min(timeit.repeat(lambda: loads(data), number=1, repeat=args.repeat))
+        dump = min(timeit.repeat(lambda: dumps(obj), number=1, repeat=args.repeat))
+        print('%-10s %12.1f %12.1f' % (name, load * 1e3, dump * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Throughput of sequential vs. prefetching iteration over a large listing.
+
+The imeji server is simulated with httmock, injecting a fixed latency per request, so
+the numbers reflect how well round trips are overlapped rather than server performance.
+
+Usage::
+
+    $ python benchmarks/listing.py --entries 20000 --size 500 --latency 0.05 --workers 1 4 8
+"""
+from __future__ import print_function, division
+import argparse
+import time
+
+from httmock import urlmatch, response, HTTMock
+from six.moves.urllib.parse import parse_qsl
+
+from pyimeji.api import Imeji
+
+SERVICE_URL = 'http://imeji.example.org'
+
+
+def listing(entries, latency):
+    @urlmatch(netloc=r'imeji\.example\.org')
+    def handler(url, request):
+        time.sleep(latency)
+        params = dict(parse_qsl(url.query))
+        offset, size = int(params.get('offset', 0)), int(params.get('size', 20))
+        page = [{'id': 'item%08d' % i} for i in range(offset, min(offset + size, entries))]
+        return response(
+            200,
+            dict(totalNumberOfResults=entries, numberOfResults=len(page),
+                 offset=offset, size=size, results=page),
+            {'content-type': 'application/json'},
+            None, 5, request)
+    return handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--entries', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with HTTMock(listing(args.entries, args.latency)):
+        api = Imeji(service_url=SERVICE_URL)
+        print('%8s %10s %12s' % ('workers', 'seconds', 'entries/s'))
+        for workers in args.workers:
+            start = time.time()
+            n = sum(1 for _ in api.iter_items(size=args.size, workers=workers))
+            elapsed = time.time() - start
+            assert n == args.entries
+            print('%8s %10.2f %12.0f' % (workers, elapsed, n / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Memory needed to hold references to the objects of a large listing.
+
+Compares the metadata dicts of a listing (as kept in the OrderedDict returned by e.g.
+`api.items()`) with compact `pyimeji.resource.Reference` objects keeping only the id and
+selected fields. Entries are decoded from copies of the item fixture.
+
+Usage::
+
+    $ python benchmarks/memory.py --entries 100000 --fields filename status
+"""
+from __future__ import print_function, division
+import argparse
+import json
+import gc
+import tracemalloc
+from collections import OrderedDict
+
+from pyimeji.resource import Reference, Item
+from pyimeji.util import pkg_path
+
+
+def page(entries):
+    with open(pkg_path('tests', 'resources', 'item.json')) as fp:
+        item = json.load(fp)
+    return json.dumps(
+        [dict(item, id='item%08d' % i, filename='file%08d.tif' % i) for i in range(entries)])
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    res = func()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return res, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--fields', nargs='*', default=['filename'])
+    args = parser.parse_args()
+    data = page(args.entries)
+
+    def dicts():
+        return OrderedDict((d['id'], d) for d in json.loads(data))
+
+    def references():
+        make = Reference.factory(args.fields, None, Item)
+        return [make(d) for d in json.loads(data)]
+
+    print('%-30s %12s' % ('representation', 'bytes/entry'))
+    for name, func in [('OrderedDict of dicts', dicts), ('Reference objects', references)]:
+        res, size = measure(func)
+        assert len(res) == args.entries
+        print('%-30s %12.0f' % (name, size / args.entries))
+        del res
+
+
+if __name__ == '__main__':
+    main()
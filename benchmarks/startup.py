@@ -0,0 +1,62 @@
+"""Time needed to import the client, as reported by ``python -X importtime``.
+
+Each run imports the module in a fresh interpreter; the median of the cumulative import
+time of the module is compared with a budget, and the modules with the largest cumulative
+import time are listed. The exit status is 1 if the budget is exceeded, so the script can
+be used as a check.
+
+Usage::
+
+    $ python benchmarks/startup.py --module pyimeji.cli --runs 10 --budget 50
+"""
+from __future__ import print_function, division
+import argparse
+import re
+import subprocess
+import sys
+
+#: Budget for the cumulative import time of the module in milliseconds.
+BUDGET = 50
+LINE = re.compile(r'import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|(?P<name>.+)$')
+
+
+def importtime(module):
+    """Import `module` in a fresh interpreter.
+
+    :return: dict mapping (indented) module names to cumulative import time in microseconds.
+    """
+    out = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.STDOUT)
+    res = {}
+    for line in out.decode('utf8').splitlines():
+        m = LINE.match(line)
+        if m:
+            res[m.group('name').rstrip()] = int(m.group('cumulative'))
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--module', default='pyimeji.api')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=BUDGET, help='milliseconds')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [importtime(args.module) for _ in range(args.runs)]
+    totals = sorted(run[' ' + args.module] / 1000 for run in runs)
+    median = totals[len(totals) // 2]
+
+    print('%-50s %10s' % ('module', 'ms'))
+    for name, us in sorted(runs[-1].items(), key=lambda i: -i[1])[:args.top]:
+        print('%-50s %10.1f' % (name, us / 1000))
+    print('\nimport %s: median %.1f ms, min %.1f ms (budget %.1f ms)' % (
+        args.module, median, totals[0], args.budget))
+    if median > args.budget:
+        print('over budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Benchmarks of the client against an in-process fake imeji server.
+
+The scenarios measure listing throughput (sequential and with parallel page requests),
+the latency of retrieving single items, upload and download rates, and the peak memory
+allocated while listing and transferring files. The server (see ``fakeserver.py``) runs in
+the same process, so memory peaks include its - small, constant - allocations.
+
+Results are written as JSON and can be compared with the results of an earlier run; the
+exit status is 1 if a metric regressed by more than the tolerance.
+
+Usage::
+
+    $ python benchmarks/suite.py --output baseline.json
+    $ python benchmarks/suite.py --latency 0.01 --compare baseline.json
+"""
+from __future__ import print_function, division
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fakeserver import FakeImeji, COLLECTION_ID
+
+from pyimeji import __version__
+from pyimeji.api import Imeji
+
+MB = 1024 * 1024
+#: Relative change of a metric which is reported as regression.
+TOLERANCE = 0.2
+#: Metrics for which larger values are better; for all others, smaller values are better.
+HIGHER_IS_BETTER = {'items_per_second', 'mb_per_second'}
+
+
+class _Sink(object):
+    """A writable file-like object discarding what is written."""
+
+    def write(self, data):
+        pass
+
+
+def _measure(func):
+    """Call `func`, tracing memory allocations.
+
+    :return: Triple (return value of func, seconds, peak of allocated MB).
+    """
+    tracemalloc.start()
+    start = time.time()
+    try:
+        res = func()
+        return res, time.time() - start, tracemalloc.get_traced_memory()[1] / MB
+    finally:
+        tracemalloc.stop()
+
+
+def listing(api, args, workers=None, fields=None):
+    collection = api.collection(COLLECTION_ID)
+    n, seconds, peak = _measure(lambda: sum(1 for _ in collection.iter_items(
+        size=args.page_size, workers=workers, fields=fields)))
+    assert n == args.items
+    return dict(items=n, seconds=seconds, items_per_second=n / seconds, peak_mb=peak)
+
+
+def single_get(api, args):
+    api.request_stats.reset()
+    start = time.time()
+    for i in range(args.gets):
+        api.item('item%08d' % (i % args.items))
+    seconds = time.time() - start
+    stats = api.stats()['requests']['GET /items/{id}']['latency']
+    return dict(
+        requests=args.gets, seconds=seconds, mean=seconds / args.gets,
+        p50=stats['p50'], p90=stats['p90'], p99=stats['p99'])
+
+
+def upload(api, args, path):
+    collection = api.collection(COLLECTION_ID)
+    size = os.path.getsize(path) * args.transfers
+
+    def run():
+        for _ in range(args.transfers):
+            collection.add_item(_file=path)
+
+    _, seconds, peak = _measure(run)
+    return dict(mb=size / MB, seconds=seconds, mb_per_second=size / MB / seconds, peak_mb=peak)
+
+
+def download(api, args):
+    item = api.item('item%08d' % 0)
+
+    def run():
+        return sum(item.download(_Sink()) for _ in range(args.transfers))
+
+    size, seconds, peak = _measure(run)
+    return dict(mb=size / MB, seconds=seconds, mb_per_second=size / MB / seconds, peak_mb=peak)
+
+
+def run(args):
+    results = {}
+    with FakeImeji(
+            items=args.items,
+            latency=args.latency,
+            payload=args.payload,
+            file_size=int(args.file_mb * MB),
+            max_page_size=args.page_size) as server:
+        api = Imeji(service_url=server.url, health_check=False)
+        results['listing'] = listing(api, args)
+        results['listing_parallel'] = listing(api, args, workers=args.workers)
+        results['listing_references'] = listing(api, args, workers=args.workers, fields=[])
+        results['single_get'] = single_get(api, args)
+        fd, path = tempfile.mkstemp(suffix='.bin')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                for chunk in server.file_chunks():
+                    fp.write(chunk)
+            results['upload'] = upload(api, args, path)
+        finally:
+            os.remove(path)
+        results['download'] = download(api, args)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Print the relative change of all metrics compared to a baseline.
+
+    :return: List of (scenario, metric) pairs which regressed by more than `tolerance`.
+    """
+    regressions = []
+    print('%-20s %-18s %12s %12s %8s' % ('scenario', 'metric', 'baseline', 'current', 'change'))
+    for scenario, metrics in sorted(results.items()):
+        for metric, value in sorted(metrics.items()):
+            old = baseline.get(scenario, {}).get(metric)
+            if not old or metric in ('items', 'requests', 'mb'):
+                continue
+            change = (value - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ''
+            if worse > tolerance:
+                regressions.append((scenario, metric))
+                flag = ' !'
+            print('%-20s %-18s %12.4f %12.4f %+7.1f%%%s' % (
+                scenario, metric, old, value, change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per request')
+    parser.add_argument('--payload', type=int, default=200, help='bytes of metadata per item')
+    parser.add_argument('--gets', type=int, default=200)
+    parser.add_argument('--file-mb', type=float, default=16)
+    parser.add_argument('--transfers', type=int, default=3)
+    parser.add_argument('--output', help='path of the JSON file to write results to')
+    parser.add_argument('--compare', help='path of a JSON file with baseline results')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'tolerance')}
+    results = run(args)
+    report = dict(
+        version=__version__,
+        python=platform.python_version(),
+        date=time.strftime('%Y-%m-%dT%H:%M:%S'),
+        params=params,
+        results=results)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if baseline.get('params') != params:
+            print('warning: baseline was measured with different parameters')
+        if compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""An asyncio client for the REST API of imeji instances.
+
+:py:class:`AsyncImeji` offers the same interface as :py:class:`pyimeji.api.Imeji`, but
+all methods which make requests - including the methods of the resources it returns -
+are coroutines:
+
+    >>> async with AsyncImeji(service_url='http://demo.imeji.org/imeji/') as api:
+    >>>     collection = await api.collection('collection_id')
+    >>>     collection.title = 'the new title'
+    >>>     collection = await collection.save()
+    >>>     async for entry in collection.iter_items(q='test'):
+    >>>         print(entry['id'])
+
+.. note::
+
+    With the asyncio client, :py:meth:`pyimeji.resource.Item.download` returns the content
+    of the file as bytes; streaming to a destination is only supported by the synchronous
+    client.
+
+.. note::
+
+    Requires python >= 3.7 and the `aiohttp <https://aiohttp.readthedocs.io>`_ package,
+    which can be installed with ``pip install pyimeji[async]``.
+"""
+import time
+import asyncio
+import logging
+import inspect
+import contextvars
+from itertools import islice
+
+import aiohttp
+
+from pyimeji.api import Imeji, ImejiError, DEFAULT_PAGE_SIZE, _check_params, _error_message, \
+    _unexpected_status, _body_size, _configured_json_backend
+from pyimeji.config import Config
+from pyimeji.multipart import MultipartEncoder
+from pyimeji.stats import RequestStats, RequestRecord
+from pyimeji.util import loads
+
+log = logging.getLogger(__name__)
+
+#: Default maximal number of requests in flight at any time.
+DEFAULT_CONCURRENCY = 100
+
+
+class _TaskPaging(object):
+    """Holds the last listing page per asyncio task, rather than per thread."""
+
+    def __init__(self):
+        self._page = contextvars.ContextVar('page', default=None)
+
+    @property
+    def page(self):
+        return self._page.get()
+
+    @page.setter
+    def page(self, value):
+        self._page.set(value)
+
+
+class AsyncImeji(Imeji):
+    """The asyncio client.
+
+    Requests are sent through one pooled `aiohttp.ClientSession`, and the number of
+    requests in flight is limited by a semaphore. The client should be closed after use,
+    either explicitly with :py:meth:`close` or by using it as async context manager.
+    """
+
+    def __init__(self, cfg=None, service_url=None, service_mode=None,
+                 concurrency=DEFAULT_CONCURRENCY, pool_size=None):
+        """
+
+        :param cfg: Configuration for the service
+        :param service_url: The service URL
+        :param service_mode: set to "private" if imeji instance runs in "private" mode
+        :param concurrency: Maximal number of requests in flight.
+        :param pool_size: Maximal number of connections in the pool, defaults to \
+        `concurrency`.
+        """
+        self.cfg = cfg or Config()
+        self.json_backend = _configured_json_backend(self.cfg)
+        self.service_url = service_url or self.cfg.get('service', 'url')
+        self.service_mode_private = \
+            self.cfg.get('service', 'mode', 'public') == 'private' or service_mode == 'private'
+        self.service_unavailable_message = \
+            "WARNING : The REST Interface of Imeji at {rest_service} is not available or " \
+            "there is another problem, check if the service is running under {imeji_service}" \
+                .format(imeji_service=self.service_url, rest_service=self.service_url + '/rest')
+
+        user = self.cfg.get('service', 'user', default=None)
+        password = self.cfg.get('service', 'password', default=None)
+        self._auth = aiohttp.BasicAuth(user, password) if user and password else None
+        self._concurrency = concurrency
+        self._pool_size = pool_size or concurrency
+        self._semaphore = None
+        self._session = None
+        self.cache = None
+        self.request_stats = RequestStats()
+        self.hooks = {'before_request': [], 'after_request': []}
+        self._paging = _TaskPaging()
+
+    asynchronous = True
+    #: Connection pool statistics are not available for the aiohttp connector.
+    pool_stats = None
+
+    @property
+    def session(self):
+        # The session and semaphore must be created within the running event loop.
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+            self._session = aiohttp.ClientSession(
+                auth=self._auth, connector=aiohttp.TCPConnector(limit=self._pool_size))
+        return self._session
+
+    async def close(self):
+        """Close the session and all pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _req(self, path, method='get', uri='', json_res=True, assert_status=200,
+                   unwrap=True, **kw):
+        """Make a request to the API of an imeji instance.
+
+        Accepts the same parameters as :py:meth:`pyimeji.api.Imeji._req`. Keyword parameters
+        for the requests library (`params`, `data`, `headers`) are translated to their
+        aiohttp equivalents.
+
+        :return: The body of the response as bytes or a decoded JSON object/array.
+        """
+        _check_params(method, path, kw.get('params'))
+        if not uri:
+            uri = self.service_url + '/rest' + path
+        record = RequestRecord(method.lower(), uri)
+        try:
+            return await self._request(record, json_res, assert_status, unwrap, **kw)
+        except Exception as e:
+            record.error = e
+            raise
+        finally:
+            record.finish()
+            self.request_stats.add(record)
+            for hook in self.hooks['after_request']:
+                hook(record)
+
+    async def _request(self, record, json_res, assert_status, unwrap, **kw):
+        method, uri = record.method, record.uri
+        for hook in self.hooks['before_request']:
+            hook(record, kw)
+        kw.pop('stream', None)
+        if kw.get('params'):
+            kw['params'] = {k: str(v) for k, v in kw['params'].items()}
+        body = kw.get('data')
+        record.bytes_out = _body_size(body)
+        if isinstance(body, MultipartEncoder):
+            kw['data'] = _stream(body)
+            kw['headers'] = dict(kw.get('headers') or {}, **{'Content-Length': str(len(body))})
+
+        session = self.session
+        record.attempts = 1
+        try:
+            start = time.time()
+            async with self._semaphore:
+                record.timings['wait'] = time.time() - start
+                async with session.request(method.upper(), uri, **kw) as res:
+                    headers = time.time()
+                    status, body = res.status, await res.read()
+                    record.timings['server'] = headers - start - record.timings['wait']
+                    record.timings['download'] = time.time() - headers
+        except Exception as e:
+            raise ImejiError(self.service_unavailable_message, e)
+        finally:
+            if hasattr(kw.get('data'), 'aclose'):
+                await kw['data'].aclose()
+
+        record.status, record.bytes_in = status, len(body)
+        if _unexpected_status(status, assert_status):  # pragma: no cover
+            raise ImejiError(
+                _error_message(status, assert_status, body.decode('utf8', 'replace')), res)
+
+        if not json_res:
+            return body
+        start = time.time()
+        try:
+            res = loads(body, self.json_backend)
+        except ValueError:  # pragma: no cover
+            log.error(body[:1000])
+            return body
+        finally:
+            record.timings['decode'] = time.time() - start
+        return self._unwrap(res, unwrap) if isinstance(res, dict) else res
+
+    async def _result(self, res, func):
+        # Resources may pass values which need no request, and functions which make
+        # further requests.
+        if inspect.isawaitable(res):
+            res = await res
+        res = func(res)
+        if inspect.isawaitable(res):
+            res = await res
+        return res
+
+    async def _page(self, path, **params):
+        res = await self._req(path, params=params, unwrap=False)
+        if isinstance(res, dict) and 'results' in res:
+            return res['results'], res['totalNumberOfResults']
+        return res, None
+
+    async def _iter(self, path, size=DEFAULT_PAGE_SIZE, offset=0, workers=None, window=None,
+                    **params):
+        """Iterate asynchronously over all entries of a listing.
+
+        Accepts the same parameters as :py:meth:`pyimeji.api.Imeji._iter`; with `workers`
+        greater than 1, up to `window` pages are requested concurrently.
+        """
+        make = self._references(path, params.pop('fields', None))
+        params = {k: v for k, v in params.items() if v is not None}
+        if not (workers and workers > 1):
+            while True:
+                page, total = await self._page(path, size=size, offset=offset, **params)
+                for d in page:
+                    yield make(d)
+                offset += len(page)
+                if not page:
+                    break
+                if (offset >= total) if total is not None else (len(page) < size):
+                    break
+            return
+
+        _, total = await self._page(path, size=0, offset=offset, **params)
+        if total is None:
+            async for d in self._iter(path, size=size, offset=offset, **params):
+                yield make(d)
+            return
+        offsets = iter(range(offset, total, size))
+        pending = []
+
+        def submit(n):
+            for o in islice(offsets, n):
+                pending.append(asyncio.ensure_future(
+                    self._full_page(path, min(size, total - o), o, params)))
+
+        try:
+            submit(window or 2 * workers)
+            while pending:
+                page = await pending.pop(0)
+                submit(1)
+                for d in page:
+                    yield make(d)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _full_page(self, path, size, offset, params):
+        page, _ = await self._page(path, size=size, offset=offset, **params)
+        while page and len(page) < size:
+            rest, _ = await self._page(
+                path, size=size - len(page), offset=offset + len(page), **params)
+            if not rest:
+                break
+            page.extend(rest)
+        return page
+
+
+async def _stream(body):
+    """Adapt a multipart encoder to the asynchronous iteration expected by aiohttp."""
+    try:
+        for chunk in body:
+            yield chunk
+    finally:
+        body.close()
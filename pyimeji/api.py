@@ -1,15 +1,37 @@
 """A client for the REST API of imeji instances."""
+import json
+import time
+import threading
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from itertools import islice
 
-import requests
 from six import string_types
+from six.moves.urllib.parse import urlencode
 
-from pyimeji import resource
+from pyimeji.bulk import BulkOperation, DEFAULT_WORKERS
+from pyimeji.cache import CacheEntry, cache_key, resource_uri, configured_cache
 from pyimeji.config import Config
+from pyimeji.retry import RetryPolicy, CircuitBreaker, retry_after, DEFAULT_RETRIES, \
+    DEFAULT_BACKOFF, DEFAULT_THRESHOLD, DEFAULT_RESET
+from pyimeji.stats import RequestStats, RequestRecord, current
+from pyimeji.util import loads, load_json_backend
 
 log = logging.getLogger(__name__)
 
+#: Number of entries requested per page when iterating over listings.
+DEFAULT_PAGE_SIZE = 100
+#: HTTP statuses counted as failures by the circuit breaker.
+SERVER_ERRORS = (502, 503, 504)
+#: Default number of seconds a successful check of a service's availability is remembered.
+DEFAULT_HEALTH_CHECK_TTL = 300
+#: Seconds to wait for the answer to an availability check, unless a connect timeout is set.
+DEFAULT_HEALTH_CHECK_TIMEOUT = 5
+
+# Time of the last successful availability check per service URL.
+_health_checked = {}
+_health_lock = threading.Lock()
+
 
 class ImejiError(Exception):
     def __init__(self, message, error):
@@ -17,14 +39,172 @@ class ImejiError(Exception):
         self.error = error.get('error') if isinstance(error, dict) else error
 
 
+class CircuitOpenError(ImejiError):
+    """Raised without sending a request while the imeji instance is considered down."""
+
+
+class ChecksumError(ImejiError):
+    """Raised when the checksum of transferred content does not match the server's."""
+
+    def __init__(self, message, algorithm, expected, actual):
+        super(ChecksumError, self).__init__(message, None)
+        self.algorithm = algorithm
+        self.expected = expected
+        self.actual = actual
+
+
+class ConflictError(ImejiError):
+    """Raised when an object to be updated has been modified by someone else since it was
+    loaded."""
+
+    def __init__(self, message, expected, actual):
+        super(ConflictError, self).__init__(message, None)
+        self.expected = expected
+        self.actual = actual
+
+
+def _body_size(data):
+    """Determine the number of bytes of a request body."""
+    if data is None:
+        return 0
+    if isinstance(data, (dict, list, tuple)):
+        # Form data, as encoded by requests.
+        return len(urlencode(data, doseq=True))
+    try:
+        return len(data)
+    except TypeError:  # pragma: no cover
+        return 0
+
+
+def _record_response(record, res, seconds, stream=False):
+    """Add the measurements for a response to a request record."""
+    record.status = res.status_code
+    elapsed = res.elapsed.total_seconds() if getattr(res, 'elapsed', None) else seconds
+    timings = record.timings
+    # The time until the response headers arrived includes pool wait and connect time.
+    timings['server'] += max(elapsed - timings['wait'] - timings['connect'], 0.0)
+    timings['download'] += max(seconds - elapsed, 0.0)
+    if stream:
+        record.bytes_in += int(res.headers.get('Content-Length') or 0)
+    else:
+        record.bytes_in += len(res.content or b'')
+
+
+def _configured_json_backend(cfg):
+    """:return: The JSON backend selected in the ``[json]`` section of the configuration, \
+    or `None` to use the default backend (see :py:func:`pyimeji.util.json_backend`)."""
+    if cfg.has_option('json', 'backend'):
+        return load_json_backend(cfg.get('json', 'backend'))
+
+
+def _check_params(method, path, params):
+    """Validate the parameters of a GET request for a list of objects."""
+    if method == "get" and params and str(path).endswith("s"):
+        can_params = {"size", "offset", "q"}
+        if not (can_params >= set(params.keys())):
+            raise ValueError("Wrong set of parameters in the request " + str(set(params) - set(can_params)))
+
+
+def _unexpected_status(status, assert_status):
+    """Check an HTTP status against the expected status (or list of acceptable statuses)."""
+    if not assert_status:
+        return False
+    if isinstance(assert_status, (tuple, list, set)):
+        return status not in assert_status
+    return status != assert_status
+
+
+def _error_message(status, assert_status, text):
+    """Log and assemble an error message for an unexpected HTTP response.
+
+    :param status: HTTP status of the response.
+    :param assert_status: Expected HTTP status.
+    :param text: Body of the response or `None`.
+    """
+    err_message = 'Unexpected HTTP status code: got HTTP %s, expected HTTP %s' % (
+        status, assert_status)
+    log.error(err_message)
+    if text is not None:
+        log.error(text[:1000])
+        try:
+            res_json = json.loads(text)
+            if "error" in res_json \
+                    and "exceptionReport" in res_json["error"] \
+                    and "title" in res_json["error"]:
+                err_message += "\nDetails from response: " + res_json["error"]["title"] + ". " + \
+                               res_json["error"]["exceptionReport"]
+            if "error" in res_json \
+                    and "id" in res_json["error"]:
+                err_message += "\nID from response: " + res_json["error"]["id"]
+        except:
+            pass
+    return err_message
+
+
+#: Attributes carrying the paging information of a listing, and the corresponding keys of
+#: the envelope of listing responses.
+PAGING = (
+    ('total_number_of_results', 'totalNumberOfResults'),
+    ('number_of_results', 'numberOfResults'),
+    ('offset', 'offset'),
+    ('size', 'size'))
+
+
+class Page(list):
+    """The results of a listing response, with the paging information of the response.
+
+    :ivar total_number_of_results: Number of entries matching the request.
+    :ivar number_of_results: Number of entries in this page.
+    :ivar offset: Offset of the first entry of this page.
+    :ivar size: Requested page size.
+    """
+
+    def __init__(self, results, envelope=None):
+        list.__init__(self, results)
+        for attr, key in PAGING:
+            setattr(self, attr, (envelope or {}).get(key))
+
+
+class ResultPage(OrderedDict):
+    """A listing, mapping object `id` to additional metadata, with the paging information
+    of the response as attributes (see :py:class:`Page`):
+
+        >>> items = api.collection('collection_id').items(size=0, q="test")
+        >>> print(items.total_number_of_results)
+
+    Attributes are `None` if the response does not carry paging information.
+    """
+
+    def __init__(self, entries, page=None):
+        OrderedDict.__init__(self, entries)
+        for attr, _ in PAGING:
+            setattr(self, attr, getattr(page, attr, None))
+
+
+def _last_page(attr):
+    def get(self):
+        return getattr(self._paging.page, attr, None)
+
+    return property(
+        get,
+        doc='`%s` of the last listing retrieved by the current thread (deprecated, use '
+            'the attributes of the returned :py:class:`ResultPage`).' % attr)
+
+
+class _Paging(threading.local):
+    page = None
+
+
 class _GET(object):
     """Handles GET requests.
 
     This includes requests
 
     - to retrieve single objects,
-    - to fetch lists of object references (which are returned as `OrderedDict` mapping
-      object `id` to additional metadata present in the response).
+    - to fetch lists of object references (which are returned as :py:class:`ResultPage`
+      mapping object `id` to additional metadata present in the response),
+    - to iterate over all object references of a listing, page by page (names prefixed
+      with `iter_`, e.g. `api.iter_items(q='x')`).
     """
 
     def __init__(self, api, name):
@@ -32,10 +212,18 @@ class _GET(object):
 
         :param api: An Imeji API instance.
         :param name: Name specifying the kind of object(s) to retrieve. We check whether\
-        this name has a plural "s" to determine if a list is to be retrieved.
+        this name has a plural "s" to determine if a list is to be retrieved, and whether\
+        it has an "iter_" prefix to determine if the list is to be iterated over.
 
         """
+        self._iter = name.startswith('iter_')
+        if self._iter:
+            name = name[len('iter_'):]
+            if not name.endswith('s'):
+                raise AttributeError('iter_' + name)
         self._list = name.endswith('s')
+        from pyimeji import resource
+
         self.rsc = getattr(resource, (name[:-1] if self._list else name).capitalize())
         self.api = api
         self.name = name
@@ -47,20 +235,27 @@ class _GET(object):
         """Calling the handler initiates an HTTP request to the imeji server.
 
         :param id: If a single object is to be retrieved it must be specified by id.
-        :return: An OrderedDict mapping id to additional metadata for lists, a \
+        :param fields: For lists, if specified, compact \
+        :py:class:`pyimeji.resource.Reference` objects keeping only the id and these fields \
+        are returned instead of metadata dicts.
+        :return: A :py:class:`ResultPage` mapping id to additional metadata for lists, a \
+        generator of metadata dicts for iterations, a \
         :py:class:`pyimeji.resource.Resource` instance for single objects.
         """
+        if self._iter:
+            return self.api._iter('/' + self.path, **kw)
         if not self._list and not id:
             raise ValueError('no id given')
         if id:
             id = '/' + id
 
+        make = self.api._references('/' + self.path, kw.pop('fields', None))
         res = self.api._req('/%s%s' % (self.path, id), params=kw)
 
         if not self._list:
-            return self.rsc(res, self.api)
+            return self.api._result(res, lambda r: self.rsc._load(r, self.api))
 
-        return OrderedDict([(d["id"], d) for d in res])
+        return self.api._result(res, lambda r: self.api._listing(r, make))
 
 
 class Imeji(object):
@@ -91,23 +286,65 @@ class Imeji(object):
             >>> # to quickly get the total number of items in a collection or matching a query
             >>> # set the size parameter to a value of 0
             >>> items= api.collection('collection_id').items(size=0, q="test")
-            >>> print (api.total_number_of_results)
+            >>> print (items.total_number_of_results)
+            >>>
+            >>> # to walk through all items matching a query, without holding more than
+            >>> # one page of results in memory at any time
+            >>> for entry in api.iter_items(q="test"):
+            >>>     print(entry["id"])
+            >>>
+            >>> # to speed this up for large listings, let 8 threads fetch pages ahead
+            >>> for entry in api.iter_items(q="test", size=500, workers=8):
+            >>>     print(entry["id"])
             >>>
 
         More usage examples you may find in the test sources at **./tests/** e.g. ** live_test_usecases.py**, **test_api.py**
+
+        A client can be shared by many threads - and should be, to reuse pooled connections.
     """
+    #: Flag signalling whether requests return awaitables, see :py:class:`pyimeji.aio.AsyncImeji`.
+    asynchronous = False
+
+    total_number_of_results = _last_page('total_number_of_results')
+    number_of_results = _last_page('number_of_results')
+    offset = _last_page('offset')
+    size = _last_page('size')
 
-    def __init__(self, cfg=None, service_url=None, service_mode=None):
+    def __init__(self, cfg=None, service_url=None, service_mode=None, cache=None,
+                 pool_connections=None, pool_maxsize=None, pool_block=None, keep_alive=None,
+                 timeout=None, retry=None, circuit_breaker=None, health_check=None):
         """
 
         :param cfg: Configuration for the service
         :param service_url: The service URL
         :param service_mode: set to "private" if imeji instance runs in "private" mode
            (any other value considered as standard imeji instance mode )
-
-        If the imeji instance is not available or does not run, the instantiation will throw an error message.
+        :param cache: A cache for GET responses (see :py:mod:`pyimeji.cache`), or `True` to \
+           use a cache as configured in the ``[cache]`` section of the configuration - or a \
+           :py:class:`pyimeji.cache.MemoryCache` with default settings. If not given, a \
+           cache is created if the configuration has a ``[cache]`` section.
+        :param pool_connections: Number of host connection pools to keep (see \
+           :py:mod:`pyimeji.pool`).
+        :param pool_maxsize: Maximal number of connections kept alive per host; should be at \
+           least the number of threads sharing the client.
+        :param pool_block: Whether to wait for a free connection if all are in use.
+        :param keep_alive: set to `False` to close connections after each request.
+        :param timeout: Timeout for requests in seconds, or pair (connect timeout, read \
+           timeout).
+        :param retry: A :py:class:`pyimeji.retry.RetryPolicy` or `False` to not retry \
+           failed requests.
+        :param circuit_breaker: A :py:class:`pyimeji.retry.CircuitBreaker` or `False` to \
+           always send requests, even if the instance seems to be down.
+        :param health_check: set to `False` to not check whether the imeji instance is \
+           available before the first request (see :py:meth:`check_service`).
+
+        Settings which are not passed are read from the ``[service]`` section of the
+        configuration.
+
+        If the imeji instance is not available or does not run, the first request will throw an error message.
         """
         self.cfg = cfg or Config()
+        self.json_backend = _configured_json_backend(self.cfg)
         self.service_url = service_url or self.cfg.get('service', 'url')
         self.service_mode_private = False or (self.cfg.get('service', 'mode', 'public') == 'private' or service_mode == 'private')
         self.service_unavailable_message = \
@@ -115,101 +352,426 @@ class Imeji(object):
             "check if the service is running under {imeji_service}" \
                 .format(imeji_service=self.service_url, rest_service=self.service_url + '/rest')
 
-        # check if Imeji instance is running and notify the user
-        try:
-            requests.head(self.service_url)
-        except Exception as e:
-            raise ImejiError(self.service_unavailable_message, e)
-
+        # The session - and the requests library - are only set up upon first use.
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._pool = dict(pool_block=self._flag('pool_block', pool_block, False))
+        for option, value in [
+                ('pool_connections', pool_connections), ('pool_maxsize', pool_maxsize)]:
+            value = value or self.cfg.get('service', option, None)
+            if value:
+                self._pool[option] = int(value)
+        self.keep_alive = self._flag('keep_alive', keep_alive, True)
+        if timeout is None:
+            timeout = (
+                self.cfg.get('service', 'connect_timeout', None),
+                self.cfg.get('service', 'read_timeout', None))
+            timeout = tuple(float(t) if t else None for t in timeout)
+        self.timeout = timeout
+        if retry is None:
+            retry = RetryPolicy(
+                retries=int(self.cfg.get('service', 'retries', DEFAULT_RETRIES)),
+                backoff=float(self.cfg.get('service', 'backoff', DEFAULT_BACKOFF)))
+        self.retry = retry or None
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(
+                threshold=int(self.cfg.get('service', 'circuit_threshold', DEFAULT_THRESHOLD)),
+                reset=float(self.cfg.get('service', 'circuit_reset', DEFAULT_RESET)))
+        self.circuit_breaker = circuit_breaker or None
+        self.health_check = self._flag('health_check', health_check, True)
+        self.health_check_ttl = float(
+            self.cfg.get('service', 'health_check_ttl', DEFAULT_HEALTH_CHECK_TTL))
+        connect_timeout = timeout[0] if isinstance(timeout, tuple) else timeout
+        self.health_check_timeout = float(
+            self.cfg.get('service', 'health_check_timeout', None)
+            or connect_timeout or DEFAULT_HEALTH_CHECK_TIMEOUT)
+        if cache is True or (cache is None and self.cfg.has_section('cache')):
+            cache = configured_cache(self.cfg)
+        self.cache = None if cache is False else cache
+        self.request_stats = RequestStats()
+        self.hooks = {'before_request': [], 'after_request': []}
+        # Paging information of the last listing retrieved by each thread.
+        self._paging = _Paging()
+
+    @property
+    def session(self):
+        """The `requests.Session` through which all requests are sent."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def _new_session(self):
+        import requests
+        from pyimeji.pool import PooledAdapter
+
+        session = requests.Session()
         user = self.cfg.get('service', 'user', default=None)
         password = self.cfg.get('service', 'password', default=None)
-        self.session = requests.Session()
         if user and password:
-            self.session.auth = (user, password)
-        # initialize the request query
-        self.total_number_of_results = self.number_of_results = self.offset = self.size = None
+            session.auth = (user, password)
+        adapter = PooledAdapter(**self._pool)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    @property
+    def pool_stats(self):
+        """The :py:class:`pyimeji.pool.PoolStats` of the session's connection pools."""
+        return self.session.get_adapter('http://').stats
+
+    def add_hook(self, event, func):
+        """Register a function to be called for each call of `_req`.
+
+        :param event: "before_request" - to call `func(record, kw)` before the request is \
+        sent, where `kw` are the keyword parameters for the requests library, which may be \
+        modified (e.g. to add headers); or "after_request" - to call `func(record)` once \
+        the request is completed or failed.
+        :param func: The callback; `record` is a :py:class:`pyimeji.stats.RequestRecord`.
+        """
+        self.hooks[event].append(func)
+
+    def stats(self):
+        """Measurements of the requests sent by the client.
 
-    def _req(self, path, method='get', uri='', json_res=True, assert_status=200, **kw):
+        :return: dict with keys "requests" (see \
+        :py:meth:`pyimeji.stats.RequestStats.as_dict`), "pool" and "cache".
+        """
+        pool = self.pool_stats if self._session is not None else None
+        return dict(
+            requests=self.request_stats.as_dict(),
+            pool=pool.as_dict() if pool is not None else None,
+            cache=self.cache.stats() if self.cache is not None else None)
+
+    def _require_sync(self, feature):
+        """Raise a `TypeError` if `feature` is used with an asynchronous client."""
+        if self.asynchronous:
+            raise TypeError('%s is only supported by the synchronous client' % feature)
+
+    def _flag(self, option, value, default):
+        """Determine a boolean setting, passed explicitly or read from ``[service]``."""
+        if value is not None:
+            return value
+        if self.cfg.has_option('service', option):
+            return self.cfg.get('service', option).lower() in ('1', 'yes', 'true', 'on')
+        return default
+
+    def _req(self, path, method='get', uri='', json_res=True, assert_status=200,
+             unwrap=True, **kw):
         """Make a request to the API of an imeji instance.
 
         :param path: HTTP path.
         :param method: HTTP method.
         :param uri: URI (used for file download).
         :param json: Flag signalling whether the response should be treated as JSON.
-        :param assert_status: Expected HTTP response status of a successful request.
+        :param assert_status: Expected HTTP response status of a successful request, or a \
+        tuple of acceptable statuses.
+        :param unwrap: Flag signalling whether the results of a JSON list response should \
+        be extracted from the envelope carrying the paging information.
         :param kw: Additional keyword parameters will be handed through to the \
         appropriate function of the requests library.
         :return: The return value of the function of the requests library or a decoded \
         JSON object/array.
         """
-        # Method GET parameter validation
-        # if parameters are there
-        if method == "get" and kw.get("params") and str(path).endswith("s"):
-            req_params = kw.get("params")
-            if req_params:
-                can_params = {"size", "offset", "q"}
-                if not (can_params >= set(req_params.keys())):
-                    raise ValueError("Wrong set of parameters in the request " + str(set(req_params) - set(can_params)))
+        _check_params(method, path, kw.get("params"))
+        method = method.lower()
 
         # if a fileURI is available, this will be request
         if not uri:
             uri = self.service_url + '/rest' + path
 
-        # check if the instance has gone away in meantime
+        record = RequestRecord(method, uri)
         try:
-            method = getattr(self.session, method.lower())
-            res = method(uri, **kw)
+            return self._request(record, json_res, assert_status, unwrap, **kw)
         except Exception as e:
-            raise ImejiError(self.service_unavailable_message, e)
-
-        if assert_status:
-            if res.status_code != assert_status:  # pragma: no cover
-                err_message = 'Unexpected HTTP status code: got HTTP %s, expected HTTP %s' % (
-                    res.status_code, assert_status)
-                log.error(err_message)
-                if hasattr(res, 'text'):
-                    log.error(res.text[:1000])
-                    try:
-                        res_json = res.json()
-                        if "error" in res_json \
-                                and "exceptionReport" in res_json["error"] \
-                                and "title" in res_json["error"]:
-                            err_message += "\nDetails from response: " + res_json["error"]["title"] + ". " + \
-                                           res_json["error"]["exceptionReport"]
-                        if "error" in res_json \
-                                and "id" in res_json["error"]:
-                            err_message += "\nID from response: " + res_json["error"]["id"]
-                    except:
-                        pass
-                    log.error(res)
-                raise ImejiError(err_message, res)
+            record.error = e
+            raise
+        finally:
+            record.finish()
+            self.request_stats.add(record)
+            for hook in self.hooks['after_request']:
+                hook(record)
+
+    def _request(self, record, json_res, assert_status, unwrap, **kw):
+        method, uri = record.method, record.uri
+        cache = self.cache if method == 'get' and json_res else None
+        entry = None
+        if cache is not None:
+            key = cache_key(uri, kw.get('params'))
+            # Requests asking for "no-cache" are only answered from the cache after
+            # revalidation.
+            entry, fresh = cache.get(
+                key, no_cache='no-cache' in (kw.get('headers') or {}).get('Cache-Control', ''))
+            if fresh:
+                record.cached = True
+                return self._unwrap(cache.data(entry, self.json_backend), unwrap)
+            if entry is not None:
+                kw['headers'] = dict(kw.get('headers') or {}, **entry.headers())
+
+        kw.setdefault('timeout', self.timeout)
+        for hook in self.hooks['before_request']:
+            hook(record, kw)
+        try:
+            if self.health_check:
+                self.check_service()
+            res = self._send(record, **kw)
+        finally:
+            # Request bodies streamed from files are closed as soon as they have been sent.
+            if hasattr(kw.get('data'), 'read') and hasattr(kw['data'], 'close'):
+                kw['data'].close()
+
+        if self.cache is not None and method not in ('get', 'head'):
+            self.cache.invalidate(resource_uri(uri))
+
+        if entry is not None and res.status_code == 304:
+            cache.revalidated(key, entry)
+            record.cached = True
+            return self._unwrap(cache.data(entry, self.json_backend), unwrap)
+
+        if _unexpected_status(res.status_code, assert_status):
+            message = _error_message(res.status_code, assert_status, getattr(res, 'text', None))
+            # Streamed responses would otherwise keep their connection out of the pool.
+            res.close()
+            raise ImejiError(message, res)
 
         if json_res:
+            start = time.time()
             try:
-                res = res.json()
-                if "results" in res:
-                    self.total_number_of_results = res["totalNumberOfResults"]
-                    self.number_of_results = res["numberOfResults"]
-                    self.offset = res["offset"]
-                    self.size = res["size"]
-                    res = res["results"]
+                data = loads(res.content, self.json_backend)
             except ValueError:  # pragma: no cover
                 log.error(res.text[:1000])
-                pass
+                return res
+            finally:
+                record.timings['decode'] = time.time() - start
+            if cache is not None:
+                cache.set(key, CacheEntry(
+                    uri,
+                    res.content,
+                    etag=res.headers.get('ETag'),
+                    last_modified=res.headers.get('Last-Modified'),
+                    modified_date=data.get('modifiedDate') if isinstance(data, dict) else None,
+                    is_list=isinstance(data, list) or 'results' in data))
+            return self._unwrap(data, unwrap)
         return res
 
+    def check_service(self, force=False):
+        """Check whether the imeji instance is running, raising an `ImejiError` if not.
+
+        A successful check is remembered for `health_check_ttl` seconds - for all clients
+        of the same service URL within the process.
+
+        The check is subject to the retry policy and the circuit breaker of the client, and
+        times out after `health_check_timeout` seconds.
+
+        :param force: Flag signalling whether to check even if a recent check succeeded.
+        """
+        if not force:
+            with _health_lock:
+                checked = _health_checked.get(self.service_url)
+            if checked is not None and time.time() - checked < self.health_check_ttl:
+                return
+        res = self._send(
+            RequestRecord('head', self.service_url), timeout=self.health_check_timeout)
+        if res.status_code in SERVER_ERRORS:
+            raise ImejiError(self.service_unavailable_message, res)
+        with _health_lock:
+            _health_checked[self.service_url] = time.time()
+
+    def _send(self, record, **kw):
+        """Send a request, retrying it if it fails with a transient error.
+
+        :param record: The :py:class:`pyimeji.stats.RequestRecord` of the request.
+        :return: The response.
+        """
+        method, uri = record.method, record.uri
+        # Bodies read from files cannot be sent again.
+        retry = self.retry if not hasattr(kw.get('data'), 'read') else None
+        record.bytes_out = _body_size(kw.get('data'))
+        attempt = 0
+        while True:
+            attempt += 1
+            record.attempts = attempt
+            if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+                raise CircuitOpenError(
+                    'Failing fast after %s consecutive failures: %s' % (
+                        self.circuit_breaker.failures, self.service_unavailable_message),
+                    None)
+            # check if the instance has gone away in meantime
+            current.record = record
+            start = time.time()
+            try:
+                res = getattr(self.session, method)(uri, **kw)
+            except Exception as e:
+                current.record = None
+                self._breaker('failure')
+                if retry is None or not retry.retryable(method, attempt):
+                    raise ImejiError(self.service_unavailable_message, e)
+                delay = retry.delay(attempt)
+                log.warning('%s %s failed: %s - retrying in %.1fs', method, uri, e, delay)
+            else:
+                current.record = None
+                _record_response(record, res, time.time() - start, kw.get('stream'))
+                self._breaker('failure' if res.status_code in SERVER_ERRORS else 'success')
+                if retry is None or not retry.retryable(method, attempt, res.status_code):
+                    return res
+                delay = retry.delay(attempt, retry_after(res.headers.get('Retry-After')))
+                log.warning(
+                    '%s %s failed with HTTP %s - retrying in %.1fs',
+                    method, uri, res.status_code, delay)
+                res.close()
+            time.sleep(delay)
+
+    def _breaker(self, outcome):
+        if self.circuit_breaker is not None:
+            getattr(self.circuit_breaker, outcome)()
+
+    def _unwrap(self, res, unwrap):
+        if unwrap and "results" in res:
+            res = Page(res["results"], res)
+            self._paging.page = res
+        return res
+
+    def _listing(self, res, make):
+        """Convert the results of a listing request into a :py:class:`ResultPage`.
+
+        :param make: Function converting entries, see :py:meth:`_references`.
+        """
+        return ResultPage([(d['id'], make(d)) for d in res], res)
+
+    def _result(self, res, func):
+        """Post-process the result of a request.
+
+        Resources pass the return value of `_req` through this method, so that clients
+        which return awaitables from `_req` (see :py:class:`pyimeji.aio.AsyncImeji`) can
+        defer the processing.
+
+        :param res: Return value of `_req` - or a value which did not require a request.
+        :param func: Function to apply to the result; it may return the result of another \
+        call of `_result`.
+        """
+        return func(res)
+
+    def _page(self, path, **params):
+        """Retrieve one page of a listing.
+
+        :return: Pair (list of entries, total number of results or `None` if the response \
+        does not carry paging information).
+        """
+        res = self._req(path, params=params, unwrap=False)
+        if isinstance(res, dict) and 'results' in res:
+            return res['results'], res['totalNumberOfResults']
+        return res, None
+
+    def _iter(self, path, size=DEFAULT_PAGE_SIZE, offset=0, workers=None, window=None,
+              **params):
+        """Iterate over all entries of a listing, requesting one page at a time.
+
+        :param path: HTTP path of the listing.
+        :param size: Number of entries to request per page.
+        :param offset: Offset of the first entry to retrieve.
+        :param workers: If greater than 1, pages are fetched in parallel by this number of \
+        threads, after the total number of results has been determined.
+        :param window: Maximal number of pages fetched ahead of the consumer when \
+        fetching in parallel; defaults to twice the number of workers.
+        :param fields: If specified, compact :py:class:`pyimeji.resource.Reference` objects \
+        keeping only the id and these fields are generated, instead of metadata dicts.
+        :param params: Additional query parameters, e.g. `q`.
+        :return: Generator of metadata dicts, as found in the `results` of the listing, \
+        in the order of the listing.
+        """
+        make = self._references(path, params.pop('fields', None))
+        params = {k: v for k, v in params.items() if v is not None}
+        if workers and workers > 1:
+            pages = self._prefetched_pages(path, size, offset, workers, window, params)
+        else:
+            pages = self._pages(path, size, offset, params)
+        for page in pages:
+            for d in page:
+                yield make(d)
+
+    def _references(self, path, fields):
+        """Create a function converting metadata dicts from the listing at `path`.
+
+        :param fields: Fields to keep in :py:class:`pyimeji.resource.Reference` objects or \
+        `None` to keep metadata dicts as they are.
+        """
+        if fields is None:
+            return lambda d: d
+        from pyimeji import resource
+
+        rsc = getattr(resource, path.rsplit('/', 1)[-1][:-1].capitalize())
+        return resource.Reference.factory(fields, self, rsc)
+
+    def _pages(self, path, size, offset, params):
+        while True:
+            page, total = self._page(path, size=size, offset=offset, **params)
+            yield page
+            offset += len(page)
+            if not page:
+                break
+            # If the server tells us the total, we rely on it, because it may return
+            # smaller pages than requested.
+            if (offset >= total) if total is not None else (len(page) < size):
+                break
+
+    def _full_page(self, path, size, offset, params):
+        page, _ = self._page(path, size=size, offset=offset, **params)
+        # The server may return smaller pages than requested; we must fill the gap
+        # before the next prefetched page starts.
+        while page and len(page) < size:
+            rest, _ = self._page(path, size=size - len(page), offset=offset + len(page), **params)
+            if not rest:
+                break
+            page.extend(rest)
+        return page
+
+    def _prefetched_pages(self, path, size, offset, workers, window, params):
+        _, total = self._page(path, size=0, offset=offset, **params)
+        if total is None:
+            # No paging information available, so we cannot plan the requests.
+            for page in self._pages(path, size, offset, params):
+                yield page
+            return
+
+        offsets = iter(range(offset, total, size))
+        pending = deque()
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        def submit(n):
+            for o in islice(offsets, n):
+                pending.append(executor.submit(
+                    self._full_page, path, min(size, total - o), o, params))
+
+        try:
+            submit(window or 2 * workers)
+            while pending:
+                page = pending.popleft().result()
+                submit(1)
+                yield page
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def __getattr__(self, name):
         """
         Names of resource classes are accepted and resolved as dynamic attribute names.
 
         This allows convenient retrieval of resources as api.<resource-class>(id=<id>),
-        or api.<resource-class>s(q='x').
+        or api.<resource-class>s(q='x'), and iteration as api.iter_<resource-class>s(q='x').
 
         """
         return _GET(self, name)
 
     def create(self, rsc, **kw):
         if isinstance(rsc, string_types):
+            from pyimeji import resource
+
             cls = getattr(resource, rsc.capitalize())
             rsc = cls(kw, self)
         return rsc.save()
@@ -217,7 +779,99 @@ class Imeji(object):
     def delete(self, rsc):
         return rsc.delete()
 
-    def update(self, rsc, **kw):
+    def update(self, rsc, check_modified=False, **kw):
+        """Set attributes of a resource and save it - if any of them changed.
+
+        :param check_modified: See :py:meth:`pyimeji.resource.Resource.save`.
+        """
         for k, v in kw.items():
             setattr(rsc, k, v)
-        return rsc.save()
+        return rsc.save(check_modified=check_modified)
+
+    def _bulk(self, rsc, func, ids, q, method=None, **kw):
+        """Apply `func` to a stub of each object, see :py:meth:`update_many`.
+
+        :param method: Name of the method of the resource class called by `func`.
+        """
+        from pyimeji import resource
+
+        self._require_sync('Bulk operations')
+        cls = getattr(resource, rsc.capitalize())
+        if method and not hasattr(cls, method):
+            raise ValueError('%s objects do not support %s' % (cls.__name__, method))
+        if ids is None:
+            if q is None:
+                raise ValueError('no ids or query given')
+            # The listing is read completely, because operating on the objects may
+            # change it - and thus the offsets of its pages.
+            ids = [d['id'] for d in self._iter('/%ss' % rsc.lower(), q=q)]
+        return BulkOperation(lambda id_: func(cls({'id': id_}, self)), ids, **kw)
+
+    def update_many(self, rsc, changes, ids=None, q=None, check_modified=False,
+                    workers=DEFAULT_WORKERS, window=None, rate=None, retries=0):
+        """Update many objects concurrently.
+
+        Each object is retrieved, changed and saved - unless the changes left it unchanged
+        (see :py:meth:`pyimeji.resource.Resource.save`):
+
+            >>> op = api.update_many('item', {'status': 'PENDING'}, q='test', rate=20)
+            >>> for result in op:
+            >>>     if not result.ok:
+            >>>         print(result.record, result.error)
+            >>> print(op.progress)
+
+        :param rsc: Name of the kind of objects, e.g. "item".
+        :param changes: dict of top-level fields to set, or function called with each \
+        :py:class:`pyimeji.resource.Resource` to change it in place.
+        :param ids: Iterable of ids of the objects.
+        :param q: Query selecting the objects, if no ids are given; the ids of all matching \
+        objects are retrieved before the operation starts.
+        :param check_modified: See :py:meth:`pyimeji.resource.Resource.save`.
+        :param workers: Number of objects processed concurrently.
+        :param window: Maximal number of objects in flight.
+        :param rate: Maximal number of objects processed per second.
+        :param retries: Number of times the operation is retried for an object.
+        :return: A :py:class:`pyimeji.bulk.BulkOperation`, yielding a \
+        :py:class:`pyimeji.bulk.Result` per object id, with the saved object as value.
+
+        Bulk operations are only supported by the synchronous client; with an asynchronous
+        client, `TypeError` is raised.
+        """
+        def update(stub):
+            obj = stub._new(self._req(stub._path()))
+            if callable(changes):
+                changes(obj)
+            else:
+                for k, v in changes.items():
+                    setattr(obj, k, v)
+            return obj.save(check_modified=check_modified)
+
+        return self._bulk(
+            rsc, update, ids, q, workers=workers, window=window, rate=rate, retries=retries)
+
+    def release_many(self, rsc, ids=None, q=None, workers=DEFAULT_WORKERS, window=None,
+                     rate=None, retries=0):
+        """Release many collections or albums concurrently, accepting the parameters of
+        :py:meth:`update_many`."""
+        return self._bulk(
+            rsc, lambda obj: obj.release(), ids, q, method='release',
+            workers=workers, window=window, rate=rate, retries=retries)
+
+    def discard_many(self, rsc, comment, ids=None, q=None, workers=DEFAULT_WORKERS,
+                     window=None, rate=None, retries=0):
+        """Discard many collections or albums concurrently, accepting the parameters of
+        :py:meth:`update_many`.
+
+        :param comment: The reason to discard the objects.
+        """
+        return self._bulk(
+            rsc, lambda obj: obj.discard(comment), ids, q, method='discard',
+            workers=workers, window=window, rate=rate, retries=retries)
+
+    def delete_many(self, rsc, ids=None, q=None, workers=DEFAULT_WORKERS, window=None,
+                    rate=None, retries=0):
+        """Delete many objects concurrently, accepting the parameters of
+        :py:meth:`update_many`."""
+        return self._bulk(
+            rsc, lambda obj: obj.delete(), ids, q, method='delete',
+            workers=workers, window=window, rate=rate, retries=retries)
@@ -0,0 +1,235 @@
+"""Bulk operations, executed with bounded concurrency on a thread pool.
+
+A :py:class:`BulkOperation` applies a function to each record of a (possibly very long)
+iterable, keeping only a bounded number of records in flight, and yields one
+:py:class:`Result` per record as soon as it is available:
+
+    >>> op = collection.add_items([('scan-0001.tif', {'title': 'first'}), ...], workers=8)
+    >>> for result in op:
+    >>>     if not result.ok:
+    >>>         print(result.record, result.error)
+    >>> print(op.progress)
+
+Bulk operations are returned by :py:meth:`pyimeji.resource.Collection.add_items`,
+:py:meth:`pyimeji.resource.Album.sync_members` and the `*_many` methods of
+:py:class:`pyimeji.api.Imeji`, e.g. :py:meth:`pyimeji.api.Imeji.update_many`; the rate
+at which records are processed can be limited with a :py:class:`RateLimiter`.
+"""
+from __future__ import division
+import time
+import logging
+import threading
+from collections import Counter, deque
+from itertools import islice
+
+log = logging.getLogger(__name__)
+
+#: Default number of worker threads of a bulk operation.
+DEFAULT_WORKERS = 4
+#: Default number of seconds to wait before the first retry of a failed record.
+DEFAULT_BACKOFF = 0.5
+
+
+def chunks(iterable, size):
+    """Split an iterable into lists of at most `size` elements."""
+    iterable = iter(iterable)
+    while True:
+        chunk = list(islice(iterable, size))
+        if not chunk:
+            break
+        yield chunk
+
+
+class Result(object):
+    """The outcome of a bulk operation for one record.
+
+    :ivar record: The input record.
+    :ivar value: The return value of the operation, `None` if it failed.
+    :ivar error: The exception raised by the operation, `None` if it succeeded.
+    :ivar seconds: Time spent processing the record.
+    :ivar attempts: Number of times the operation was tried.
+    """
+
+    def __init__(self, record, value=None, error=None, seconds=0.0, attempts=1):
+        self.record = record
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<Result %s %r>' % ('ok' if self.ok else 'error', self.error or self.value)
+
+
+class Progress(object):
+    """Counters to report the throughput of a bulk operation.
+
+    :ivar errors: `Counter` of the names of the exception types of failed records.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes = 0
+        self.errors = Counter()
+
+    def add(self, result, nbytes=0):
+        if result.ok:
+            self.succeeded += 1
+            self.bytes += nbytes
+        else:
+            self.failed += 1
+            self.errors[type(result.error).__name__] += 1
+
+    @property
+    def done(self):
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    @property
+    def items_per_second(self):
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / 1024 / 1024 / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return '%s succeeded, %s failed in %.1fs (%.1f items/s, %.2f MB/s)' % (
+            self.succeeded, self.failed, self.elapsed, self.items_per_second,
+            self.mb_per_second)
+
+
+class RateLimiter(object):
+    """A thread-safe limiter, spacing the returns of :py:meth:`wait` evenly to at most `rate`
+    per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.time()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+            at = max(self._next, now)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class BulkOperation(object):
+    """An iterable over the results of applying a function to many records.
+
+    The operation starts when iteration starts; at most `window` records are submitted
+    to the thread pool at any time, so records may be read lazily from a large source.
+    If iteration is stopped early, records not yet started are cancelled, and the records
+    in progress are completed before the iterator is closed.
+    """
+
+    def __init__(self, func, records, workers=DEFAULT_WORKERS, window=None, ordered=False,
+                 size=None, retries=0, backoff=DEFAULT_BACKOFF, rate=None):
+        """
+
+        :param func: Function to call with each record.
+        :param records: Iterable of records.
+        :param workers: Number of worker threads.
+        :param window: Maximal number of records in flight, defaults to twice the number \
+        of workers.
+        :param ordered: Flag signalling whether results should be yielded in the order of \
+        the records, rather than in the order of completion.
+        :param size: Function returning the number of bytes transferred for a record, used \
+        to compute the throughput in MB/s.
+        :param retries: Number of times a failed record is retried.
+        :param backoff: Seconds to wait before the first retry; doubled for each further \
+        retry.
+        :param rate: Maximal number of calls of `func` per second - including retries - \
+        across all workers.
+        """
+        self.func = func
+        self.records = records
+        self.workers = workers
+        self.window = window or 2 * workers
+        self.ordered = ordered
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate) if rate else None
+        self.progress = Progress()
+
+    def _call(self, record):
+        start = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.limiter is not None:
+                self.limiter.wait()
+            try:
+                value = self.func(record)
+                if hasattr(value, '__await__'):
+                    # e.g. a request of an asynchronous client, which would never be sent.
+                    getattr(value, 'close', lambda: None)()
+                    raise TypeError('bulk operations do not support awaitables')
+                return Result(record, value=value, seconds=time.time() - start, attempts=attempt)
+            except Exception as e:
+                log.debug('bulk operation failed for %r: %s', record, e)
+                if attempt > self.retries:
+                    return Result(
+                        record, error=e, seconds=time.time() - start, attempts=attempt)
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def _done(self, result):
+        nbytes = 0
+        if result.ok and self.size:
+            try:
+                nbytes = self.size(result.record)
+            except Exception:  # pragma: no cover
+                pass
+        self.progress.add(result, nbytes)
+        return result
+
+    def __iter__(self):
+        self.progress = Progress()
+        records = iter(self.records)
+        pending = deque()
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        def submit(n):
+            for record in islice(records, n):
+                pending.append(executor.submit(self._call, record))
+
+        try:
+            submit(self.window)
+            while pending:
+                if self.ordered:
+                    done = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                for future in done:
+                    yield self._done(future.result())
+                submit(self.window - len(pending))
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def run(self):
+        """Execute the operation, discarding the results.
+
+        :return: The :py:class:`Progress` of the finished operation.
+        """
+        for _ in self:
+            pass
+        return self.progress
@@ -0,0 +1,406 @@
+"""Caching of GET responses of the imeji REST API.
+
+A cache is passed to :py:class:`pyimeji.api.Imeji` upon instantiation - or configured in
+the ``[cache]`` section of the configuration:
+
+.. code-block:: ini
+
+    [cache]
+    size = 1000
+    ttl = 60
+
+or, to keep responses across runs in a persistent cache (:py:class:`DiskCache`) limited to
+`max_size` bytes:
+
+.. code-block:: ini
+
+    [cache]
+    type = disk
+    directory = /var/cache/pyimeji
+    max_size = 104857600
+    ttl = 3600
+
+Responses are cached for `ttl` seconds. Expired entries are revalidated with a conditional
+request if the server provided an `ETag` or `Last-Modified` header, and all entries for a
+resource - as well as all cached listings - are dropped when the resource is modified
+through the client.
+"""
+import os
+import time
+import calendar
+import zlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from six.moves.urllib.parse import urlencode
+
+from pyimeji.config import APP_DIRS
+from pyimeji.util import parse_date, loads
+
+#: Default maximal number of cached responses.
+DEFAULT_SIZE = 1000
+#: Default number of seconds a cached response is considered fresh.
+DEFAULT_TTL = 60
+#: Default maximal number of bytes stored by a persistent cache.
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+#: Number of seconds within which repeated hits of a persistent cache entry do not update
+#: its last access time.
+ACCESS_RESOLUTION = 60
+#: Fraction of `max_size` a persistent cache is shrunk to when the limit is exceeded.
+EVICTION_TARGET = 0.9
+
+
+def cache_key(uri, params=None):
+    """Compute the cache key for a GET request."""
+    if params:
+        return uri + '?' + urlencode(sorted((k, str(v)) for k, v in params.items()))
+    return uri
+
+
+def resource_uri(uri):
+    """Compute the URI of the resource affected by a modifying request to `uri`.
+
+    >>> resource_uri('http://example.org/rest/albums/abc/members/link')
+    'http://example.org/rest/albums/abc'
+
+    :return: The URI of the resource or `None`, if the request creates a new resource.
+    """
+    base, _, path = uri.partition('/rest/')
+    comps = path.split('/')
+    if len(comps) < 2 or not comps[1]:
+        return None
+    return '%s/rest/%s/%s' % (base, comps[0], comps[1])
+
+
+def _memberships(uri):
+    """Items are cached as members of albums as well, see
+    :py:meth:`pyimeji.resource.Album.member`.
+
+    :return: Pair (prefix of album URIs, suffix of the URIs of an item's memberships) or \
+    `None` if `uri` is not the URI of an item.
+    """
+    base, _, path = (uri or '').partition('/rest/')
+    if not path.startswith('items/'):
+        return None
+    return '%s/rest/albums/' % base, '/' + path
+
+
+class CacheEntry(object):
+    """A cached JSON response, with the validators needed to revalidate it."""
+
+    def __init__(self, uri, data, etag=None, last_modified=None, modified_date=None,
+                 is_list=False):
+        self.uri = uri
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.modified_date = modified_date
+        self.is_list = is_list
+        self.stored = time.time()
+
+    def fresh(self, ttl):
+        return time.time() - self.stored < ttl
+
+    def headers(self):
+        """HTTP headers for a conditional request revalidating the entry."""
+        res = {}
+        if self.etag:
+            res['If-None-Match'] = self.etag
+        if self.last_modified:
+            res['If-Modified-Since'] = self.last_modified
+        elif self.modified_date:
+            # Without validators from the server, the object's modification date is the
+            # best guess for the date of the cached representation.
+            from email.utils import formatdate
+
+            res['If-Modified-Since'] = formatdate(
+                calendar.timegm(parse_date(self.modified_date).utctimetuple()), usegmt=True)
+        return res
+
+
+class _Cache(object):
+    """Functionality shared by all caches.
+
+    :ivar hits: Number of lookups answered from the cache without a request.
+    :ivar misses: Number of lookups for which a request had to be made.
+    :ivar revalidations: Number of misses answered by the server with `304 Not Modified`.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = self.misses = self.revalidations = 0
+        self._stats_lock = threading.Lock()
+
+    def _found(self, entry, no_cache):
+        fresh = not no_cache and entry is not None and entry.fresh(self.ttl)
+        with self._stats_lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry, fresh
+
+    def revalidated(self, key, entry):
+        """Mark an expired entry as fresh again, after the server confirmed it."""
+        entry.stored = time.time()
+        with self._stats_lock:
+            self.revalidations += 1
+        self.set(key, entry)
+
+    def data(self, entry, backend=None):
+        """Decode the cached response; the result may be modified by the caller.
+
+        :param backend: JSON backend, see :py:func:`pyimeji.util.loads`.
+        """
+        return loads(entry.data, backend)
+
+    def stats(self):
+        return dict(
+            size=len(self),
+            hits=self.hits,
+            misses=self.misses,
+            revalidations=self.revalidations)
+
+
+class MemoryCache(_Cache):
+    """A thread-safe, bounded in-memory cache, evicting the least recently used entries."""
+
+    def __init__(self, size=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        _Cache.__init__(self, ttl)
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, no_cache=False):
+        """Look up a cached response.
+
+        :param no_cache: Flag signalling that the entry must be revalidated - e.g. for \
+        requests with a `Cache-Control: no-cache` header - and thus is not a hit.
+        :return: Pair (entry or `None`, flag signalling whether the entry is fresh).
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return self._found(entry, no_cache)
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, uri):
+        """Drop all entries for the resource at `uri` - including the album memberships of
+        an item - and all cached listings.
+
+        :param uri: Resource URI as computed by :py:func:`resource_uri` or `None`.
+        """
+        memberships = _memberships(uri)
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.is_list or (uri and (entry.uri == uri or entry.uri.startswith(uri + '/'))):
+                    del self._entries[key]
+                elif memberships and entry.uri.startswith(memberships[0]) \
+                        and entry.uri.endswith(memberships[1]):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache(_Cache):
+    """A persistent cache, storing compressed responses in an SQLite database.
+
+    The cache can be shared by concurrent processes (and threads): SQLite serializes
+    writes, and readers are not blocked by writers. The total size of the stored responses
+    is kept in a separate table; when it exceeds `max_size` bytes, the least recently used
+    entries are evicted, down to :py:data:`EVICTION_TARGET` of `max_size`. Lookups only
+    write to the database to record the access time of an entry, at most once per
+    `access_resolution` seconds.
+    """
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL,
+                 access_resolution=ACCESS_RESOLUTION):
+        """
+
+        :param directory: Directory of the database; defaults to the user's cache directory.
+        :param max_size: Maximal number of bytes of (compressed) responses to store.
+        :param ttl: Number of seconds a cached response is considered fresh.
+        :param access_resolution: Number of seconds within which repeated hits of an entry \
+        do not update its last access time.
+        """
+        _Cache.__init__(self, ttl)
+        directory = directory or APP_DIRS.user_cache_dir
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:  # pragma: no cover
+                # another process may have created it in the meantime.
+                pass
+        self.path = os.path.join(directory, 'responses.sqlite')
+        self.max_size = max_size
+        self.access_resolution = access_resolution
+        self._local = threading.local()
+        with self._transaction() as db:
+            db.execute("""\
+CREATE TABLE IF NOT EXISTS entry (
+    key TEXT PRIMARY KEY,
+    uri TEXT,
+    data BLOB,
+    size INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    modified_date TEXT,
+    is_list INTEGER,
+    stored REAL,
+    accessed REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS entry_uri ON entry(uri)")
+            db.execute("CREATE INDEX IF NOT EXISTS entry_accessed ON entry(accessed)")
+            db.execute("CREATE INDEX IF NOT EXISTS entry_is_list ON entry(is_list)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            db.execute(
+                "INSERT OR IGNORE INTO meta "
+                "SELECT 'size', coalesce(sum(size), 0) FROM entry")
+
+    @property
+    def _db(self):
+        # SQLite connections must not be shared between threads.
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            import sqlite3
+
+            # Transactions are managed explicitly, see _transaction.
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a transaction holding the write lock from the start.
+
+        Reads of the running total and the writes depending on them must not interleave
+        with those of other processes.
+        """
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def __len__(self):
+        return self._db.execute("SELECT count(*) FROM entry").fetchone()[0]
+
+    def get(self, key, no_cache=False):
+        """Look up a cached response.
+
+        :param no_cache: Flag signalling that the entry must be revalidated - e.g. for \
+        requests with a `Cache-Control: no-cache` header - and thus is not a hit.
+        :return: Pair (entry or `None`, flag signalling whether the entry is fresh).
+        """
+        db = self._db
+        row = db.execute(
+            "SELECT uri, data, etag, last_modified, modified_date, is_list, stored, accessed "
+            "FROM entry WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return self._found(None, no_cache)
+        now = time.time()
+        if now - row[7] > self.access_resolution:
+            db.execute("UPDATE entry SET accessed = ? WHERE key = ?", (now, key))
+        entry = CacheEntry(
+            row[0], zlib.decompress(row[1]), etag=row[2], last_modified=row[3],
+            modified_date=row[4], is_list=bool(row[5]))
+        entry.stored = row[6]
+        return self._found(entry, no_cache)
+
+    def set(self, key, entry):
+        import sqlite3
+
+        data = zlib.compress(entry.data)
+        with self._transaction() as db:
+            old = db.execute("SELECT size FROM entry WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO entry VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.uri, sqlite3.Binary(data), len(data), entry.etag,
+                 entry.last_modified, entry.modified_date, int(entry.is_list), entry.stored,
+                 time.time()))
+            size = self._add_size(db, len(data) - (old[0] if old else 0))
+            if size > self.max_size:
+                self._evict(db, size - int(self.max_size * EVICTION_TARGET))
+
+    @staticmethod
+    def _add_size(db, delta):
+        """Update the total size of the stored responses, returning the new total."""
+        db.execute("UPDATE meta SET value = value + ? WHERE key = 'size'", (delta,))
+        return db.execute("SELECT value FROM meta WHERE key = 'size'").fetchone()[0]
+
+    def _evict(self, db, excess):
+        """Delete least recently used entries until `excess` bytes are freed."""
+        freed = 0
+        while freed < excess:
+            rows = db.execute(
+                "SELECT key, size FROM entry ORDER BY accessed LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                db.execute("DELETE FROM entry WHERE key = ?", (key,))
+                freed += size
+                if freed >= excess:
+                    break
+        self._add_size(db, -freed)
+
+    def _delete(self, db, where, params=()):
+        size = db.execute(
+            "SELECT coalesce(sum(size), 0) FROM entry WHERE " + where, params).fetchone()[0]
+        if size:
+            db.execute("DELETE FROM entry WHERE " + where, params)
+            self._add_size(db, -size)
+
+    def invalidate(self, uri):
+        """Drop all entries for the resource at `uri` - including the album memberships of
+        an item - and all cached listings.
+
+        :param uri: Resource URI as computed by :py:func:`resource_uri` or `None`.
+        """
+        with self._transaction() as db:
+            self._delete(db, "is_list = 1")
+            if uri:
+                # '0' follows '/', so the range selects the URIs starting with uri + '/'.
+                self._delete(
+                    db, "uri = ? OR (uri > ? AND uri < ?)", (uri, uri + '/', uri + '0'))
+            memberships = _memberships(uri)
+            if memberships:
+                prefix, suffix = memberships
+                self._delete(
+                    db,
+                    "uri > ? AND uri < ? AND substr(uri, -?) = ?",
+                    (prefix, prefix[:-1] + '0', len(suffix), suffix))
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute("DELETE FROM entry")
+            db.execute("UPDATE meta SET value = 0 WHERE key = 'size'")
+
+
+def configured_cache(cfg):
+    """Create a cache as specified in the ``[cache]`` section of a configuration.
+
+    :param cfg: A :py:class:`pyimeji.config.Config` instance.
+    """
+    ttl = float(cfg.get('cache', 'ttl', DEFAULT_TTL))
+    if cfg.get('cache', 'type', 'memory') == 'disk':
+        return DiskCache(
+            directory=cfg.get('cache', 'directory', None),
+            max_size=int(cfg.get('cache', 'max_size', DEFAULT_MAX_SIZE)),
+            ttl=ttl)
+    return MemoryCache(size=int(cfg.get('cache', 'size', DEFAULT_SIZE)), ttl=ttl)
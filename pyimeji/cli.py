@@ -6,6 +6,8 @@ Usage:
   imeji create <what> <properties>
   imeji [options] retrieve <what> <id>
   imeji delete <what> <id>
+  imeji [options] export <what> <id> [--output=<path>] [--gzip] [--hydrate] [--workers=<n>]
+  imeji [options] import <collection-id> <file> [--journal=<path>] [--workers=<n>]
   imeji -h | --help
   imeji --version
 
@@ -13,21 +15,28 @@ Options:
   -h --help        Show this screen.
   --version        Show version.
   --service=<URL>  URL of the imeji service
+  --output=<path>  File to export the items of a collection or album to as NDJSON \
+[default: -].
+  --gzip           Compress the export (the default for output files ending in .gz).
+  --hydrate        Export the full record of each item rather than the listing entries.
+  --journal=<path> File recording the imported lines, to resume an interrupted import; \
+defaults to <file>.journal.
+  --workers=<n>    Number of concurrent requests [default: 4].
 """
 
 from __future__ import unicode_literals, print_function
 import sys
+import logging
 
 from docopt import docopt
 
-from pyimeji.config import Config
-from pyimeji.api import Imeji
-
 
 __version__ = "0.1.1"
 __author__ = "Robert Forkel"
 __license__ = "MIT"
 
+log = logging.getLogger(__name__)
+
 
 def parsed_kw(s):
     return {k: v for k, v in [pair.split('=') for pair in s.split(';')]}
@@ -42,9 +51,13 @@ def checked_call(f, *args, **kw):
 
 def main(argv=None):  # pragma: no cover
     """Main entry point for the imeji CLI."""
-    cfg = Config()
     args = docopt(__doc__, version=__version__, argv=argv)
-    api = Imeji(cfg, service_url=args['--service'])
+    # The API - and with it the HTTP libraries - are only imported after the arguments
+    # have been parsed, and reading the configuration must not write to the filesystem.
+    from pyimeji.config import Config
+    from pyimeji.api import Imeji
+
+    api = Imeji(Config(create=False), service_url=args['--service'])
     if args['retrieve']:
         return checked_call(getattr(api, args['<what>']), id=args['<id>'])
     if args['create']:
@@ -52,6 +65,29 @@ def main(argv=None):  # pragma: no cover
     if args['delete']:
         return checked_call(
             api.delete, checked_call(getattr(api, args['<what>']), id=args['<id>']))
+    if args['export']:
+        from pyimeji.ndjson import open_output, export
+
+        with open_output(args['--output'], compress=args['--gzip'] or None) as fp:
+            export(
+                getattr(api, args['<what>'])(id=args['<id>']),
+                fp,
+                hydrate=args['--hydrate'],
+                workers=int(args['--workers']))
+    if args['import']:
+        from pyimeji.ndjson import import_items
+
+        failed = 0
+        for result in import_items(
+                api.collection(args['<collection-id>']),
+                args['<file>'],
+                journal=args['--journal'],
+                workers=int(args['--workers'])):
+            if not result.ok:
+                failed += 1
+                log.error('line %s: %s', result.record[0], result.error)
+        if failed:
+            return Exception('%s items could not be imported' % failed)
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -60,5 +96,6 @@ if __name__ == '__main__':  # pragma: no cover
         status = -1
     else:
         status = 0
-        print(res)
+        if res is not None:
+            print(res)
     sys.exit(status)
@@ -16,14 +16,22 @@ NO_DEFAULT = NoDefault()
 
 class Config(RawConfigParser):
     def __init__(self, **kw):
+        """
+
+        :param config_dir: Directory of the config file, defaults to the user's config \
+        directory.
+        :param config_file: Name of the config file.
+        :param create: set to `False` to not write an empty config file if none exists.
+        """
         config_dir = kw.pop('config_dir', None) or APP_DIRS.user_config_dir
+        create = kw.pop('create', True)
         RawConfigParser.__init__(self, kw)
         config_file = kw.pop('config_file', 'config.ini')
         cfg_path = os.path.join(config_dir, config_file)
         if os.path.exists(cfg_path):
             assert os.path.isfile(cfg_path)
             self.read(cfg_path)
-        else:
+        elif create:
             if not os.path.exists(config_dir):
                 try:
                     os.makedirs(config_dir)
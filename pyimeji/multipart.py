@@ -0,0 +1,140 @@
+"""Streaming encoding of multipart/form-data request bodies.
+
+The requests library assembles multipart bodies passed as `files` in memory. A
+:py:class:`MultipartEncoder` instead behaves like a file opened for reading, producing the
+body piece by piece while it is sent, so that uploading a file of any size needs a constant
+amount of memory. Checksums of the files are computed on the fly, if requested.
+"""
+import os
+import mmap
+import hashlib
+import binascii
+from collections import deque
+
+from six import text_type
+
+#: Number of bytes read from a file at a time, if the reader does not ask for a size.
+CHUNK_SIZE = 1024 * 1024
+
+
+def _disposition(name, filename):
+    return 'Content-Disposition: form-data; name="%s"; filename="%s"\r\n' % (
+        name.replace('"', '\\"'), filename.replace('"', '\\"'))
+
+
+class _File(object):
+    """A file part of the body, opened lazily and closed as soon as it has been read."""
+
+    def __init__(self, path, use_mmap=False, hashes=None):
+        self.path = path
+        self.use_mmap = use_mmap
+        self.hashes = hashes or {}
+        self.size = os.path.getsize(path)
+        self._fp = self._map = None
+
+    def read(self, n):
+        if self._fp is None:
+            self._fp = open(self.path, 'rb')
+            if self.use_mmap and self.size:
+                self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        data = (self._map or self._fp).read(n)
+        for h in self.hashes.values():
+            h.update(data)
+        if len(data) < n:
+            self.close()
+        return data
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+
+class MultipartEncoder(object):
+    """A multipart/form-data body, which can be passed as `data` to the requests library.
+
+    Text values are sent as parts named and with a filename after the field - like the
+    requests library does when passing strings as `files`; file values are specified by
+    their path and read only when the body is read.
+    """
+
+    def __init__(self, fields, files=None, callback=None, use_mmap=False, checksums=()):
+        """
+
+        :param fields: List of pairs (name, text or bytes).
+        :param files: List of pairs (name, path of a local file).
+        :param callback: Function called as `callback(bytes_read, total_bytes)` whenever \
+        a piece of the body has been read.
+        :param use_mmap: Flag signalling whether files should be memory mapped rather \
+        than read.
+        :param checksums: Names of hash algorithms (as understood by `hashlib`) to compute \
+        for each file while it is read; available from the `checksums` dict, mapping field \
+        name to dict mapping algorithm to hash object.
+        """
+        self.boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self.callback = callback
+        self._parts = deque()
+        self.checksums = {}
+        for name, value in fields:
+            if isinstance(value, text_type):
+                value = value.encode('utf8')
+            self._add(_disposition(name, name), value)
+        for name, path in files or []:
+            self.checksums[name] = {alg: hashlib.new(alg) for alg in checksums}
+            self._add(
+                _disposition(name, os.path.basename(path)) +
+                'Content-Type: application/octet-stream\r\n',
+                _File(path, use_mmap=use_mmap, hashes=self.checksums[name]))
+        self._parts.append(('--%s--\r\n' % self.boundary).encode('utf8'))
+        self.len = sum(p.size if isinstance(p, _File) else len(p) for p in self._parts)
+        self.bytes_read = 0
+
+    def _add(self, headers, body):
+        self._parts.append(('--%s\r\n%s\r\n' % (self.boundary, headers)).encode('utf8'))
+        self._parts.append(body)
+        self._parts.append(b'\r\n')
+
+    def __len__(self):
+        return self.len
+
+    def read(self, n=-1):
+        """Read the next `n` bytes of the body - or all remaining bytes if `n` is negative."""
+        if n is None or n < 0:
+            n = self.len - self.bytes_read
+        chunks, remaining = [], n
+        while remaining > 0 and self._parts:
+            part = self._parts[0]
+            if isinstance(part, _File):
+                data = part.read(remaining)
+                if len(data) < remaining:
+                    self._parts.popleft()
+            else:
+                data = part[:remaining]
+                if len(data) < len(part):
+                    self._parts[0] = part[remaining:]
+                else:
+                    self._parts.popleft()
+            chunks.append(data)
+            remaining -= len(data)
+        data = b''.join(chunks)
+        self.bytes_read += len(data)
+        if self.callback:
+            self.callback(self.bytes_read, self.len)
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        """Close all files which have not been read completely."""
+        for part in self._parts:
+            if isinstance(part, _File):
+                part.close()
@@ -0,0 +1,194 @@
+"""Export and import of items as newline-delimited JSON (NDJSON).
+
+Each line of an export is the JSON representation of one item. Items are listed page by
+page, and written as soon as they are available, so exporting a collection of any size
+needs a bounded amount of memory:
+
+    >>> with open_output('backup.ndjson.gz') as fp:
+    >>>     export(api.collection('collection_id'), fp, hydrate=True, workers=8)
+
+Such a file can be imported into a collection; the numbers of the lines which have been
+imported are recorded in a journal, so that an interrupted import can be resumed:
+
+    >>> for result in import_items(api.collection('other_id'), 'backup.ndjson.gz'):
+    >>>     if not result.ok:
+    >>>         print(result.record[0], result.error)
+"""
+import io
+import os
+import sys
+import gzip
+import logging
+import threading
+import contextlib
+
+from pyimeji.api import DEFAULT_PAGE_SIZE
+from pyimeji.bulk import BulkOperation, DEFAULT_WORKERS
+from pyimeji.resource import Resource
+from pyimeji.util import dumps, loads
+
+log = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def open_output(path=None, compress=None):
+    """Open the destination of an export for writing bytes.
+
+    :param path: Path of the output file; `None` or "-" for standard output.
+    :param compress: Flag signalling whether to gzip the output; defaults to compressing \
+    if the path ends with ".gz".
+    """
+    if compress is None:
+        compress = bool(path) and path.endswith('.gz')
+    if not path or path == '-':
+        stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+        fp = gzip.GzipFile(fileobj=stdout, mode='wb') if compress else stdout
+        try:
+            yield fp
+        finally:
+            # Standard output itself is only flushed, not closed.
+            if compress:
+                fp.close()
+            stdout.flush()
+    else:
+        with (gzip.open(path, 'wb') if compress else io.open(path, 'wb')) as fp:
+            yield fp
+
+
+def entries(container, hydrate=False, workers=DEFAULT_WORKERS, size=DEFAULT_PAGE_SIZE):
+    """Iterate over the JSON objects of the items of a collection or an album.
+
+    :param container: A :py:class:`pyimeji.resource.Collection` or \
+    :py:class:`pyimeji.resource.Album`.
+    :param hydrate: Flag signalling whether the full record of each item should be \
+    retrieved, rather than exporting the entries of the listing.
+    :param workers: Number of concurrent requests - for pages of the listing, and for \
+    full item records.
+    :param size: Number of items requested per page.
+    """
+    listing = getattr(container, 'iter_items', None) or container.iter_members
+    items = listing(size=size, workers=workers if workers > 1 else None)
+    if not hydrate:
+        for d in items:
+            yield d
+        return
+    api = container._api
+    for result in BulkOperation(
+            lambda d: api._req('/items/%s' % d['id']), items, workers=workers, ordered=True):
+        if not result.ok:
+            raise result.error
+        yield result.value
+
+
+def export(container, fp, hydrate=False, workers=DEFAULT_WORKERS, size=DEFAULT_PAGE_SIZE):
+    """Write the items of a collection or an album to `fp`, one JSON object per line.
+
+    Accepts the same parameters as :py:func:`entries`.
+
+    :param fp: File-like object opened for writing bytes, see :py:func:`open_output`.
+    :return: The number of exported items.
+    """
+    n = 0
+    for n, d in enumerate(entries(container, hydrate=hydrate, workers=workers, size=size), 1):
+        fp.write(dumps(d, container._api.json_backend).encode('utf8'))
+        fp.write(b'\n')
+        if n % 10000 == 0:
+            log.info('%s items exported', n)
+    return n
+
+
+#: Properties of exported items which are managed by the server, and thus not imported.
+SERVER_PROPERTIES = set(Resource.__readonly__) | {
+    'collectionId', 'fileUrl', 'thumbnailUrl', 'webResolutionUrlUrl', 'status', 'version',
+    'versionDate', 'discardComment', 'visibility', 'checksumMd5'}
+
+
+def read_records(path, backend=None):
+    """Iterate over the objects in an NDJSON file, which may be gzipped.
+
+    :param backend: JSON backend, see :py:func:`pyimeji.util.loads`.
+    :return: Generator of pairs (line number, object), skipping blank lines.
+    """
+    with (gzip.open(path, 'rb') if path.endswith('.gz') else io.open(path, 'rb')) as fp:
+        for n, line in enumerate(fp, 1):
+            if line.strip():
+                yield n, loads(line, backend)
+
+
+class Journal(object):
+    """An append-only record of the lines of an NDJSON file which have been imported."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """:return: dict mapping numbers of imported lines to the ids of created items."""
+        res = {}
+        if os.path.exists(self.path):
+            with io.open(self.path, encoding='utf8') as fp:
+                for line in fp:
+                    try:
+                        n, id_ = line.rstrip('\n').split('\t')
+                        res[int(n)] = id_
+                    except ValueError:  # pragma: no cover
+                        # A line only partially written before a crash.
+                        continue
+        return res
+
+    def __enter__(self):
+        self._fp = io.open(self.path, 'a', encoding='utf8')
+        return self
+
+    def __exit__(self, *args):
+        self._fp.close()
+
+    def add(self, n, id_):
+        with self._lock:
+            self._fp.write('%s\t%s\n' % (n, id_))
+            self._fp.flush()
+
+
+def _import_kw(record):
+    kw = {k: v for k, v in record.items() if k not in SERVER_PROPERTIES}
+    if not set(kw) & {'_file', 'fetchUrl', 'referenceUrl'} and record.get('fileUrl'):
+        kw['fetchUrl'] = record['fileUrl']
+    return kw
+
+
+def import_items(collection, path, journal=None, workers=DEFAULT_WORKERS, window=None):
+    """Create items in a collection from the objects in an NDJSON file.
+
+    Items are created concurrently with :py:meth:`pyimeji.resource.Collection.add_item`;
+    properties managed by the server are dropped, and content is fetched from the
+    `fileUrl` of an exported item unless the object specifies `_file`, `fetchUrl` or
+    `referenceUrl`. Lines listed in the journal are skipped, and lines which have been
+    imported successfully are added to it - as soon as the item has been created, even if
+    the results are not consumed anymore.
+
+    :param collection: A :py:class:`pyimeji.resource.Collection`.
+    :param path: Path of the NDJSON file.
+    :param journal: Path of the journal, defaults to `path` with suffix ".journal".
+    :param workers: Number of items created concurrently.
+    :param window: Maximal number of records in flight.
+    :return: Generator of :py:class:`pyimeji.bulk.Result`, with a pair (line number, \
+    object) as record and the created Item as value.
+    """
+    journal = Journal(journal or path + '.journal')
+    done = journal.load()
+    if done:
+        log.info('resuming import, skipping %s lines', len(done))
+
+    def create(record):
+        item = collection.add_item(**_import_kw(record[1]))
+        journal.add(record[0], item.id)
+        return item
+
+    with journal:
+        for result in BulkOperation(
+                create,
+                ((n, d) for n, d in read_records(path, collection._api.json_backend)
+                 if n not in done),
+                workers=workers,
+                window=window):
+            yield result
@@ -0,0 +1,131 @@
+"""Connection pooling for the synchronous client.
+
+:py:class:`pyimeji.api.Imeji` sends its requests through a :py:class:`PooledAdapter`, which
+keeps up to `pool_maxsize` connections per host alive for reuse. To share one client among
+many threads, the pool should be at least as large as the number of threads - configured
+in the ``[service]`` section of the configuration:
+
+.. code-block:: ini
+
+    [service]
+    pool_maxsize = 32
+    pool_block = true
+    connect_timeout = 5
+    read_timeout = 60
+
+The time requests spend waiting for a free connection is recorded in a
+:py:class:`PoolStats` instance; a large wait time signals that the pool is the limiting
+factor.
+"""
+from __future__ import division
+import time
+import threading
+
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from pyimeji.stats import add_time
+
+#: Default number of host pools as well as connections per host kept alive.
+DEFAULT_POOL_SIZE = DEFAULT_POOLSIZE
+
+
+class PoolStats(object):
+    """Thread-safe counters for the time spent waiting for pooled connections.
+
+    :ivar checkouts: Number of connections taken from the pool.
+    :ivar wait: Total number of seconds spent waiting for a connection.
+    :ivar max_wait: Longest wait for a connection in seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait = self.max_wait = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    @property
+    def mean_wait(self):
+        return self.wait / self.checkouts if self.checkouts else 0.0
+
+    def as_dict(self):
+        return dict(
+            checkouts=self.checkouts,
+            wait=self.wait,
+            mean_wait=self.mean_wait,
+            max_wait=self.max_wait)
+
+
+class _TimedPool(object):
+    """Mixin for urllib3 connection pools, timing the checkout of connections."""
+    stats = None
+
+    def _get_conn(self, timeout=None):
+        start = time.time()
+        try:
+            return super(_TimedPool, self)._get_conn(timeout=timeout)
+        finally:
+            seconds = time.time() - start
+            self.stats.add(seconds)
+            add_time('wait', seconds)
+
+
+class _TimedConnection(object):
+    """Mixin for urllib3 connections, timing the establishment of connections."""
+
+    def connect(self):
+        start = time.time()
+        try:
+            return super(_TimedConnection, self).connect()
+        finally:
+            add_time('connect', time.time() - start)
+
+
+class PooledAdapter(HTTPAdapter):
+    """A transport adapter recording the time spent waiting for pooled connections."""
+
+    def __init__(self, pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE,
+                 pool_block=False, stats=None, **kw):
+        """
+
+        :param pool_connections: Number of host pools to keep.
+        :param pool_maxsize: Maximal number of connections kept alive per host.
+        :param pool_block: Flag signalling whether requests should wait for a free \
+        connection when all connections to a host are in use, rather than opening a \
+        connection which is discarded afterwards.
+        :param stats: :py:class:`PoolStats` instance to record the wait times in.
+        """
+        self.stats = stats or PoolStats()
+        HTTPAdapter.__init__(
+            self,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            **kw)
+
+    def init_poolmanager(self, *args, **kw):
+        HTTPAdapter.init_poolmanager(self, *args, **kw)
+        classes = {}
+        for scheme, cls in [('http', HTTPConnectionPool), ('https', HTTPSConnectionPool)]:
+            classes[scheme] = type('Timed' + cls.__name__, (_TimedPool, cls), {
+                'stats': self.stats,
+                'ConnectionCls': type(
+                    'Timed' + cls.ConnectionCls.__name__,
+                    (_TimedConnection, cls.ConnectionCls),
+                    {}),
+            })
+        self.poolmanager.pool_classes_by_scheme = classes
+
+    def __getstate__(self):
+        state = HTTPAdapter.__getstate__(self)
+        state['stats'] = self.stats
+        return state
+
+    def __setstate__(self, state):
+        self.stats = state.pop('stats', None) or PoolStats()
+        HTTPAdapter.__setstate__(self, state)
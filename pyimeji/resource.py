@@ -1,15 +1,98 @@
 import os
-import json
+import hashlib
 from collections import OrderedDict
 
 from six import string_types
-from dateutil.parser import parse
+
+from pyimeji.bulk import BulkOperation, DEFAULT_WORKERS, chunks
+from pyimeji.multipart import MultipartEncoder
+from pyimeji.util import parse_date, dumps
+
+
+#: Number of bytes read and written at a time when downloading files.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+#: Default maximal number of album members linked or unlinked with one request.
+MEMBERS_CHUNK_SIZE = 500
 
 
 class ReadOnlyAttributeError(AttributeError):
     pass
 
 
+class Reference(object):
+    """A compact reference to an object, as listed in the results of a list request.
+
+    A reference keeps only the object's id and the values of selected top-level fields;
+    the full object is retrieved lazily - upon first access of any other attribute - and
+    kept for subsequent accesses.
+
+        >>> refs = list(api.iter_items(fields=['filename']))
+        >>> refs[0].filename  # no request
+        >>> refs[0].metadata  # retrieves the item
+
+    Lazy retrieval of the full object is only supported by the synchronous client.
+    """
+    __slots__ = ('id', '_values', '_fields', '_api', '_cls', '_obj')
+
+    def __init__(self, id, values, fields, api, cls):
+        """
+
+        :param id: Id of the object.
+        :param values: Tuple of field values.
+        :param fields: dict mapping field names to index in `values` - shared by all \
+        references in a listing.
+        :param api: An Imeji API instance.
+        :param cls: Resource class of the object.
+        """
+        self.id = id
+        self._values = values
+        self._fields = fields
+        self._api = api
+        self._cls = cls
+        self._obj = None
+
+    @classmethod
+    def factory(cls, fields, api, rsc):
+        """Create a function turning metadata dicts from a listing into references."""
+        index = {f: i for i, f in enumerate(fields)}
+        return lambda d: cls(d['id'], tuple(d.get(f) for f in fields), index, api, rsc)
+
+    @property
+    def resource(self):
+        """The referenced object, retrieved upon first access."""
+        if self._obj is None:
+            self._api._require_sync('Lazy retrieval of referenced objects')
+            self._obj = self._cls._load(
+                self._api._req('/%ss/%s' % (self._cls.__name__.lower(), self.id)), self._api)
+        return self._obj
+
+    def __getattr__(self, attr):
+        try:
+            return self._values[self._fields[attr]]
+        except KeyError:
+            if attr.startswith('_'):
+                raise AttributeError(attr)
+        return getattr(self.resource, attr)
+
+    def __eq__(self, other):
+        return isinstance(other, Reference) and (self._cls, self.id) == (other._cls, other.id)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return '<%s %s>' % (self._cls.__name__, self.id)
+
+
+def _changed(loaded, value):
+    if isinstance(value, (dict, list)):
+        return loaded != (dumps(value),)
+    return type(loaded) is not type(value) or loaded != value
+
+
 class Resource(object):
     """
     Super class implementing common methods for other resource objects
@@ -21,11 +104,39 @@ class Resource(object):
         self._api = api
         self._json = d
         self._parent = parent
+        self._dates = {}
         for k, v in d.items():
             try:
                 self.__setattr__(k, v)
             except ReadOnlyAttributeError:
                 pass
+        # Top-level fields as loaded from the imeji instance, or `None` for objects created
+        # locally, see _load.
+        self._loaded = None
+
+    @classmethod
+    def _load(cls, d, api):
+        """Create an object from its representation as retrieved from the imeji instance."""
+        obj = cls(d, api)
+        # Values of mutable fields are kept serialized - wrapped in a tuple, which JSON
+        # values never are - to detect in place modifications as well.
+        obj._loaded = {
+            k: (dumps(v),) if isinstance(v, (dict, list)) else v for k, v in d.items()}
+        return obj
+
+    @property
+    def changed_fields(self):
+        """Names of the top-level fields which were set, deleted or modified in place since
+        the object was loaded - or of all fields, if the object was created locally."""
+        if self._loaded is None:
+            return sorted(self._json)
+        return sorted(
+            k for k in set(self._json) | set(self._loaded)
+            if k not in self._loaded or k not in self._json
+            or _changed(self._loaded[k], self._json[k]))
+
+    def _dirty(self):
+        return bool(self.changed_fields)
 
     def _path(self, *comps, **kw):
         _comps = []
@@ -50,7 +161,12 @@ class Resource(object):
             raise AttributeError(attr)
 
         if attr.endswith('Date'):
-            res = parse(res)
+            # Parsed timestamps are cached, as long as the raw value does not change.
+            raw, parsed = self._dates.get(attr, (None, None))
+            if raw is None or raw != res:
+                parsed = parse_date(res)
+                self._dates[attr] = (res, parsed)
+            res = parsed
 
         #
         # TODO: once this is available, resolve users to proper objects upon access!
@@ -69,23 +185,67 @@ class Resource(object):
         Provides a JSON serialization of the resources.
 
         """
-        return json.dumps(self._json, **kw)
+        return dumps(self._json, backend=getattr(self._api, 'json_backend', None), **kw)
 
     def __repr__(self):
         return self.dumps(sort_keys=True, indent=4, separators=(',', ': '))
 
-    def save(self):
+    def save(self, check_modified=False):
         """
             Saves the object upon which it is called (creates new or updates an existing one) and invokes the REST API of the imeji instance.
             If the "id" of the object is provided, it attempt to update an existing object, otherwise, new object will be created.
+
+            An existing object is only updated if it has been changed (see
+            :py:attr:`changed_fields`); otherwise no request is made and the object itself is
+            returned. Objects created locally - rather than retrieved - are always sent.
+
+            :param check_modified: If `True`, an existing object is retrieved before it is \
+                updated, and :py:class:`pyimeji.api.ConflictError` is raised if its \
+                `modifiedDate` differs from the one loaded - i.e. if someone else updated it \
+                in the meantime. This narrows - but cannot close - the window in which \
+                concurrent updates overwrite each other.
         """
         kw = dict(
             method='put' if self._json.get('id') else 'post',
-            data=self.dumps(),
+            data=self.dumps().encode('utf8'),
             headers={'content-type': 'application/json'})
         if kw['method'] == 'post':
             kw['assert_status'] = 201
-        return self.__class__(self._api._req(self._path(), **kw), self._api)
+        return self._save(
+            lambda: self._api._result(self._api._req(self._path(), **kw), self._new),
+            check_modified)
+
+    def _save(self, send, check_modified):
+        """Save the object, unless it is an unchanged existing object.
+
+        :param send: Function sending the request, returning the result of `_result`.
+        :param check_modified: See :py:meth:`save`.
+        """
+        if not self._json.get('id'):
+            return send()
+        if not self._dirty():
+            return self._api._result(self, lambda rsc: rsc)
+        if not check_modified:
+            return send()
+        return self._api._result(
+            self._api._req(self._path(), headers={'Cache-Control': 'no-cache'}),
+            lambda d: self._check_modified(d) or send())
+
+    def _check_modified(self, current):
+        """Raise ConflictError if `current` has been modified after the loaded object."""
+        from pyimeji.api import ConflictError
+
+        # modifiedDate is read-only, i.e. still as loaded.
+        expected, actual = self._json.get('modifiedDate'), current.get('modifiedDate')
+        if expected is None or actual is None or parse_date(expected) == parse_date(actual):
+            return
+        raise ConflictError(
+            '%s %s has been modified at %s' % (self.__class__.__name__, self.id, actual),
+            parse_date(expected),
+            parse_date(actual))
+
+    def _new(self, d):
+        return self._load(d, self._api)
 
     def delete(self):
         """
@@ -148,22 +308,37 @@ class Album(_WithAuthor, _DiscardReleaseMixin):
     def members(self, **kw):
         """
             Lists all items which are members of the current album. Accepts q (fulltext query), size and offset parameters.
-            The default value of size is "20".
+            The default value of size is "20". If fields are given, compact references
+            (see :py:class:`Reference`) are listed instead of metadata dicts.
+        """
+        make = self._api._references(self._path('items'), kw.pop('fields', None))
+        return self._api._result(
+            self._api._req(self._path('items'), params=kw),
+            lambda res: self._api._listing(res, make))
+
+    def iter_members(self, **kw):
+        """
+            Iterates over all items which are members of the current album, requesting one page
+            at a time. Accepts q (fulltext query), size (page size) and offset parameters, as well
+            as workers and window to fetch pages in parallel and fields to generate compact
+            references (see :py:meth:`pyimeji.api.Imeji._iter`).
         """
-        return OrderedDict(
-            [(d['id'], d) for d in self._api._req(self._path('items'), params=kw)])
+        return self._api._iter(self._path('items'), **kw)
 
     def member(self, id):
         """
-            Gets an item with provided id (which is a member of the current album)
+            Gets an item with provided id (which is a member of the current album), requesting
+            it directly from the album's items; returns None if the item is not a member.
         """
-        for id_, d in self.members().items():
-            if id_ == id:
-                return Resource(d, self._api, parent=self)
+        return self._api._result(
+            self._api._req(self._path('items', id), assert_status=(200, 404)),
+            lambda res: Resource(res, self._api, parent=self)
+            if isinstance(res, dict) and 'id' in res else None)
 
     def _act_on_members(self, op, *ids, **kw):
         return self._api._req(
-            self._path('members', op), method='put', data=json.dumps(*ids), **kw)
+            self._path('members', op), method='put',
+            data=dumps(*ids, backend=self._api.json_backend), **kw)
 
     def link(self, *ids):
         """
@@ -180,6 +355,37 @@ class Album(_WithAuthor, _DiscardReleaseMixin):
         """
         return self._act_on_members('unlink', *ids, **{'assert_status': 204})
 
+    def sync_members(self, desired_ids, chunk_size=MEMBERS_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                     retries=2):
+        """
+            Makes the given items the members of the current album, linking and unlinking only
+            the items whose membership changes.
+
+            The current members are listed page by page; the changes are then applied in chunks
+            of ids, concurrently, retrying failed chunks. Nothing is changed until the returned
+            operation is iterated over or run.
+
+            :param desired_ids: Iterable of identifiers of the items which should be members.
+            :param chunk_size: Maximal number of ids linked or unlinked with one request.
+            :param workers: Number of requests sent concurrently.
+            :param retries: Number of times a failed request is retried.
+            :rtype: :py:class:`pyimeji.bulk.BulkOperation` yielding one \
+                :py:class:`pyimeji.bulk.Result` per chunk, with a pair (operation, list of ids) \
+                as record.
+        """
+        self._api._require_sync('Album.sync_members')
+        current = set(ref.id for ref in self.iter_members(fields=[]))
+        desired = OrderedDict((id_, None) for id_ in desired_ids)
+        changes = [('link', chunk) for chunk in chunks(
+            (id_ for id_ in desired if id_ not in current), chunk_size)]
+        changes.extend(('unlink', chunk) for chunk in chunks(
+            (id_ for id_ in current if id_ not in desired), chunk_size))
+        return BulkOperation(
+            lambda change: getattr(self, change[0])(change[1]),
+            changes,
+            workers=workers,
+            retries=retries)
+
 
 class Collection(_WithAuthor, _DiscardReleaseMixin):
     """
@@ -190,14 +396,26 @@ class Collection(_WithAuthor, _DiscardReleaseMixin):
     def items(self, **kw):
         """
           Lists all items within current collection. Accepts q (fulltext query), size and offset parameters.
-          The default value of size is "20".
+          The default value of size is "20". If fields are given, compact references
+          (see :py:class:`Reference`) are listed instead of metadata dicts.
         """
-        return OrderedDict(
-            [(d['id'], d) for d in self._api._req(self._path('items'), params=kw)])
+        make = self._api._references(self._path('items'), kw.pop('fields', None))
+        return self._api._result(
+            self._api._req(self._path('items'), params=kw),
+            lambda res: self._api._listing(res, make))
 
             # ['id']: Item(d, self._api) for d in
             # self._api._req(self._path('items'), params=kw)}
 
+    def iter_items(self, **kw):
+        """
+          Iterates over all items within current collection, requesting one page at a time.
+          Accepts q (fulltext query), size (page size) and offset parameters, as well as
+          workers and window to fetch pages in parallel and fields to generate compact
+          references (see :py:meth:`pyimeji.api.Imeji._iter`).
+        """
+        return self._api._iter(self._path('items'), **kw)
+
     def add_item(self, **kw):
         """
             Creates a new item within the current collection. It accepts a url or a file
@@ -212,6 +430,30 @@ class Collection(_WithAuthor, _DiscardReleaseMixin):
         """
         return self._api.create('item', collectionId=self.id, **kw)
 
+    def add_items(self, records, workers=DEFAULT_WORKERS, window=None, ordered=False):
+        """
+            Creates many new items within the current collection, uploading them in parallel.
+
+            Each record is either a dict of keyword parameters for :py:meth:`add_item`, or a pair
+            (source, metadata), where source is a local file path or a URL to fetch the content
+            from, and metadata is a dict of item properties (or `None`).
+
+            :param records: Iterable of records; it is consumed lazily.
+            :param workers: Number of items created concurrently.
+            :param window: Maximal number of records in flight.
+            :param ordered: Whether to report results in the order of the records.
+            :rtype: :py:class:`pyimeji.bulk.BulkOperation` yielding one \
+                :py:class:`pyimeji.bulk.Result` per record, with the created Item as value.
+        """
+        self._api._require_sync('Collection.add_items')
+        return BulkOperation(
+            lambda record: self.add_item(**_item_kw(record)),
+            records,
+            workers=workers,
+            window=window,
+            ordered=ordered,
+            size=_item_size)
+
     def __setattr__(self, attr, value):
         if attr == 'profile':
             if isinstance(value, string_types):
@@ -220,17 +462,21 @@ class Collection(_WithAuthor, _DiscardReleaseMixin):
                 value = dict(profileId=value.id, method="copy")
         Resource.__setattr__(self, attr, value)
 
-    def save(self):
+    def save(self, check_modified=False):
         """
             Creates a new collection or updates an existing collection, depending if "id" parameter is provided
             in the JSON body of the request or not.
 
+            :param check_modified: See :py:meth:`Resource.save`.
             :rtype: Collection
         """
         if self._json.get('id'):
-            kw = dict(method='put' if self._json.get('id') else 'post', data=self.dumps(),
+            kw = dict(method='put',
+                      data=self.dumps().encode('utf8'),
                       headers={'Content-Type': 'application/json'})
-            return self.__class__(self._api._req(self._path(), **kw), self._api)
+            return self._save(
+                lambda: self._api._result(self._api._req(self._path(), **kw), self._new),
+                check_modified)
         return Resource.save(self)
 
     def item_template(self):
@@ -241,8 +487,26 @@ class Collection(_WithAuthor, _DiscardReleaseMixin):
             :rtype: Item
 
         """
-        json_item = self._api._req(self._path('items/template'))
-        return Item(json_item, self._api._req(self._path('items')))
+        return self._api._result(
+            self._api._req(self._path('items/template')), lambda d: Item._load(d, self._api))
+
+
+def _item_kw(record):
+    """Translate a bulk ingestion record to keyword parameters for item creation."""
+    if isinstance(record, dict):
+        return dict(record)
+    source, metadata = record
+    kw = dict(metadata or {})
+    if source.startswith('http://') or source.startswith('https://'):
+        kw['fetchUrl'] = source
+    else:
+        kw['_file'] = source
+    return kw
+
+
+def _item_size(record):
+    _file = _item_kw(record).get('_file')
+    return os.path.getsize(_file) if _file else 0
 
 
 class Profile(Resource, _DiscardReleaseMixin):
@@ -261,8 +525,8 @@ class Profile(Resource, _DiscardReleaseMixin):
 
         :rtype: Item
         """
-        json_item = self._api._req(self._path('template'))
-        return Item(json_item, self._api._req(self._path('template')))
+        return self._api._result(
+            self._api._req(self._path('template')), lambda d: Item._load(d, self._api))
 
     def copy(self):
         """
@@ -270,13 +534,13 @@ class Profile(Resource, _DiscardReleaseMixin):
 
         :rtype: Profile
         """
-        return Profile(
+        return self._api._result(
             self._api._req(self._path(batch=True),
                            method='post',
                            json_res=True,
                            assert_status=201,
-                           data=self.dumps()),
-            self._api._req(self._path()))
+                           data=self.dumps().encode('utf8')),
+            self._new)
 
 
 class Item(Resource):
@@ -313,29 +577,152 @@ class Item(Resource):
         assert os.path.exists(value)
         self.__file = value
 
-    def save(self):
-        """
-            Saves the Item object and creates a new item, or updates an existing item.
-
-            :rtype: Item
+    def save(self, progress=None, use_mmap=False, checksums=('md5',), check_modified=False):
         """
-        # FIXME: verify md5 sum upon creation of item from local file!
-        kw = dict(
-            method='put' if self._json.get('id') else 'post',
-            assert_status=200 if self._json.get('id') else 201,
-            files=dict(json=self.dumps()))
-
-        if self._file:
-            kw['files']['file'] = open(self._file, 'rb')
+            Saves the Item object and creates a new item, or updates an existing item - if it
+            has been changed or a file is to be uploaded.
 
-        return self.__class__(self._api._req(self._path(), **kw), self._api)
+            The request body is streamed, i.e. a file to upload is read piece by piece while
+            it is sent, and closed as soon as it has been read. Checksums of the file are
+            computed while it is read and compared to the ones returned by the server.
 
-    def download(self):
-        """
-            Downloads the file of the Item object and returns it.
+            :param progress: Function called as `progress(bytes_sent, total_bytes)` while \
+                the request body is sent.
+            :param use_mmap: Flag signalling whether the file should be memory mapped rather \
+                than read.
+            :param checksums: Names of the hash algorithms to verify, e.g. `('md5', 'sha256')`; \
+                an algorithm is only verified if the server returns the corresponding checksum \
+                (e.g. `checksumMd5`).
+            :param check_modified: See :py:meth:`Resource.save`.
+            :raises: :py:class:`pyimeji.api.ChecksumError` if a checksum does not match.
+            :rtype: Item
         """
-
-        return self._api._req(
+        def send():
+            body = MultipartEncoder(
+                [('json', self.dumps())],
+                files=[('file', self._file)] if self._file else None,
+                callback=progress,
+                use_mmap=use_mmap,
+                checksums=checksums)
+            kw = dict(
+                method='put' if self._json.get('id') else 'post',
+                assert_status=200 if self._json.get('id') else 201,
+                data=body,
+                headers={'Content-Type': body.content_type})
+
+            def saved(d):
+                # We can only vouch for the checksum, if the complete file has been sent.
+                if self._file and body.bytes_read == len(body):
+                    _verify_checksums(body.checksums['file'], d, self._file)
+                return self._new(d)
+
+            return self._api._result(self._api._req(self._path(), **kw), saved)
+
+        return self._save(send, check_modified)
+
+    def _dirty(self):
+        return bool(self._file) or Resource._dirty(self)
+
+    def download(self, dest=None, chunk_size=DOWNLOAD_CHUNK_SIZE, resume=False,
+                 checksums=('md5',)):
+        """
+            Downloads the file of the Item object.
+
+            If no destination is given, the response - with the file content in memory - is
+            returned. Otherwise the content is streamed to the destination chunk by chunk, so
+            memory use does not depend on the size of the file.
+
+            :param dest: Path of a local file or writable file-like object.
+            :param chunk_size: Number of bytes to read and write at a time.
+            :param resume: If `dest` is the path of a partially downloaded file, only request \
+                the missing bytes (using an HTTP Range request) and append them.
+            :param checksums: Names of the hash algorithms to verify, computed while the \
+                content is written; an algorithm is only verified if the item has the \
+                corresponding checksum (e.g. `checksumMd5`). When resuming, the partial file is \
+                read once to initialize the checksums.
+            :raises: :py:class:`pyimeji.api.ChecksumError` if a checksum does not match.
+            :return: Number of bytes written, if `dest` is given.
+        """
+        if dest is None:
+            return self._api._req(
+                self._path(''),
+                uri=self.fileUrl,
+                json_res=False)
+        self._api._require_sync('Streaming downloads to a destination')
+
+        from pyimeji.api import ImejiError
+
+        offset = 0
+        if resume and isinstance(dest, string_types) and os.path.exists(dest):
+            offset = os.path.getsize(dest)
+        hashes = {alg: hashlib.new(alg) for alg in checksums}
+        res = self._api._req(
             self._path(''),
             uri=self.fileUrl,
-            json_res=False)
+            json_res=False,
+            stream=True,
+            assert_status=(200, 206, 416) if offset else 200,
+            headers={'Range': 'bytes=%s-' % offset} if offset else {})
+        try:
+            if res.status_code == 416:
+                # The range is not satisfiable, which is fine if we already have all bytes.
+                if res.headers.get('Content-Range') == 'bytes */%s' % offset:
+                    _update_hashes(hashes, dest, chunk_size)
+                    _verify_checksums(hashes, self._json, dest)
+                    return 0
+                raise ImejiError('Cannot resume download at byte %s' % offset, res)
+            if res.status_code == 200:
+                # The server ignored the Range header, so we start from scratch.
+                offset = 0
+            elif hashes:
+                _update_hashes(hashes, dest, chunk_size)
+            expected = res.headers.get('Content-Length')
+            if res.headers.get('Content-Encoding', 'identity') != 'identity':
+                # The length refers to the encoded content.
+                expected = None
+
+            written = 0
+            fp = open(dest, 'ab' if offset else 'wb') \
+                if isinstance(dest, string_types) else dest
+            try:
+                for chunk in res.iter_content(chunk_size):
+                    fp.write(chunk)
+                    for h in hashes.values():
+                        h.update(chunk)
+                    written += len(chunk)
+            finally:
+                if fp is not dest:
+                    fp.close()
+        finally:
+            res.close()
+
+        if expected is not None and written != int(expected):
+            raise ImejiError(
+                'Incomplete download: got %s bytes, expected %s' % (written, expected), res)
+        _verify_checksums(hashes, self._json, self.fileUrl)
+        return written
+
+
+def _update_hashes(hashes, path, chunk_size):
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            for h in hashes.values():
+                h.update(chunk)
+
+
+def _verify_checksums(hashes, d, name):
+    """Compare computed hashes with the checksums of an item's JSON representation.
+
+    :param hashes: dict mapping algorithm names to `hashlib` hash objects.
+    :param d: JSON representation of an item, with checksums as e.g. `checksumMd5`.
+    :param name: Name of the content, used in error messages.
+    """
+    from pyimeji.api import ChecksumError
+
+    for alg, h in hashes.items():
+        expected = d.get('checksum' + alg.capitalize())
+        if expected and expected.lower() != h.hexdigest():
+            raise ChecksumError(
+                '%s checksum mismatch for %s: expected %s, got %s' % (
+                    alg, name, expected, h.hexdigest()),
+                alg, expected, h.hexdigest())
@@ -0,0 +1,145 @@
+"""Retrying failed requests and failing fast when an imeji instance is down.
+
+Requests which fail with a connection error - or with one of the statuses in
+:py:data:`RETRY_STATUSES` - are retried according to a :py:class:`RetryPolicy`, waiting a
+jittered, exponentially growing time between attempts, or the time the server asked for in
+a `Retry-After` header. Only idempotent requests are retried.
+
+A :py:class:`CircuitBreaker` counts consecutive failures; once the instance seems to be
+down, requests fail immediately, until - after a while - one trial request is let through.
+
+Both are configured in the ``[service]`` section of the configuration:
+
+.. code-block:: ini
+
+    [service]
+    retries = 5
+    backoff = 1
+    circuit_threshold = 10
+    circuit_reset = 60
+"""
+from __future__ import division
+import time
+import random
+import threading
+
+#: HTTP statuses signalling a transient problem.
+RETRY_STATUSES = (429, 502, 503, 504)
+#: HTTP methods which can be retried safely.
+IDEMPOTENT_METHODS = ('get', 'head', 'options', 'put', 'delete')
+#: Default number of retries of a failed request.
+DEFAULT_RETRIES = 2
+#: Default number of seconds to wait before the first retry.
+DEFAULT_BACKOFF = 0.5
+#: Default maximal number of seconds to wait between attempts.
+DEFAULT_MAX_BACKOFF = 30
+#: Default number of consecutive failures after which the circuit opens.
+DEFAULT_THRESHOLD = 5
+#: Default number of seconds until an open circuit lets a trial request through.
+DEFAULT_RESET = 30
+
+
+def retry_after(value, now=None):
+    """Parse the value of a `Retry-After` header.
+
+    >>> retry_after('120')
+    120.0
+
+    :return: Number of seconds to wait or `None`.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        from email.utils import parsedate_tz, mktime_tz
+
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        return max(mktime_tz(date) - (now or time.time()), 0.0)
+
+
+class RetryPolicy(object):
+    """Decides whether and when a failed request is retried."""
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS):
+        """
+
+        :param retries: Maximal number of retries of a request.
+        :param backoff: Seconds to wait before the first retry; the upper bound of the \
+        random wait time doubles with each further retry.
+        :param max_backoff: Maximal number of seconds to wait, unless the server asks for \
+        more with a `Retry-After` header.
+        :param statuses: HTTP statuses of responses which are retried.
+        :param methods: HTTP methods of requests which are retried.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.methods = methods
+
+    def retryable(self, method, attempt, status=None):
+        """
+        :param method: HTTP method of the request.
+        :param attempt: Number of attempts made so far.
+        :param status: HTTP status of the response, or `None` if the request failed \
+        without response.
+        """
+        if attempt > self.retries or method.lower() not in self.methods:
+            return False
+        return status is None or status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        """Compute the number of seconds to wait after the `attempt`-th failed attempt."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker(object):
+    """A thread-safe circuit breaker.
+
+    The circuit opens after `threshold` consecutive failures. While open, :py:meth:`allow`
+    refuses requests; after `reset` seconds, one trial request is allowed, and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, reset=DEFAULT_RESET):
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def open(self):
+        return self.opened is not None
+
+    def allow(self):
+        """Check whether a request may be sent."""
+        with self._lock:
+            if self.opened is None:
+                return True
+            if not self._trial and time.time() - self.opened >= self.reset:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened = time.time()
+                self._trial = False
@@ -0,0 +1,197 @@
+"""Instrumentation of the requests sent by a client.
+
+Each call of :py:meth:`pyimeji.api.Imeji._req` is described by a :py:class:`RequestRecord`,
+which is aggregated per method and endpoint - i.e. the path with object ids replaced by
+``{id}`` - in the client's :py:class:`RequestStats`:
+
+    >>> api.stats()['requests']['GET /collections/{id}/items']['latency']['p90']
+    0.25
+
+The time of a request is split into phases:
+
+- `wait`: waiting for a free connection in the pool,
+- `connect`: name resolution and establishing new connections (0 for reused connections),
+- `server`: sending the request and waiting for the response headers,
+- `download`: reading the response body,
+- `decode`: decoding the JSON response.
+
+Records can be passed on to other metrics systems with hooks, see
+:py:meth:`pyimeji.api.Imeji.add_hook`.
+"""
+from __future__ import division
+import time
+import threading
+from collections import Counter
+
+#: Upper bounds (in seconds) of the buckets of latency histograms.
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    float('inf'))
+PHASES = ('wait', 'connect', 'server', 'download', 'decode')
+_RESOURCES = {'items', 'collections', 'albums', 'profiles'}
+_ACTIONS = {'template', 'release', 'discard', 'members', 'link', 'unlink'}
+
+# The record of the request being sent by the current thread, if any.
+current = threading.local()
+
+
+def endpoint(uri):
+    """Compute the endpoint of a request, replacing object ids in the path.
+
+    >>> endpoint('http://example.org/rest/collections/abc/items?q=x')
+    '/collections/{id}/items'
+    """
+    base, sep, path = uri.partition('/rest/')
+    if not sep:
+        # e.g. file downloads
+        return '/' + base.split('://', 1)[-1].partition('/')[2].split('?')[0]
+    comps = path.split('?')[0].rstrip('/').split('/')
+    for i in range(1, len(comps)):
+        if comps[i - 1] in _RESOURCES and comps[i] not in _ACTIONS:
+            comps[i] = '{id}'
+    return '/' + '/'.join(comps)
+
+
+def add_time(phase, seconds):
+    """Add time spent in a phase to the record of the request sent by the current thread."""
+    record = getattr(current, 'record', None)
+    if record is not None:
+        record.timings[phase] += seconds
+
+
+class RequestRecord(object):
+    """Measurements for one call of `_req`, which may comprise several attempts.
+
+    :ivar method: HTTP method.
+    :ivar uri: URI of the request.
+    :ivar status: HTTP status of the (last) response, or `None`.
+    :ivar attempts: Number of times the request was sent.
+    :ivar cached: Flag signalling whether the response was answered from the cache.
+    :ivar bytes_in: Number of bytes of the response body.
+    :ivar bytes_out: Number of bytes of the request body.
+    :ivar timings: dict mapping phases (see :py:data:`PHASES`) to seconds.
+    :ivar seconds: Total time of the call.
+    :ivar error: The exception raised by the call, or `None`.
+    """
+    __slots__ = (
+        'method', 'uri', 'status', 'attempts', 'cached', 'bytes_in', 'bytes_out', 'timings',
+        'start', 'seconds', 'error')
+
+    def __init__(self, method, uri):
+        self.method = method
+        self.uri = uri
+        self.status = None
+        self.attempts = 0
+        self.cached = False
+        self.bytes_in = self.bytes_out = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.start = time.time()
+        self.seconds = None
+        self.error = None
+
+    @property
+    def endpoint(self):
+        return endpoint(self.uri)
+
+    def finish(self):
+        self.seconds = time.time() - self.start
+
+    def __repr__(self):
+        return '<RequestRecord %s %s %s %.3fs>' % (
+            self.method.upper(), self.uri, self.status, self.seconds or 0)
+
+
+class Histogram(object):
+    """A latency histogram with fixed buckets (see :py:data:`BUCKETS`)."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = self.max = 0.0
+
+    def add(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket it falls into."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(bound, self.max)
+        return 0.0
+
+    def as_dict(self):
+        return dict(
+            count=self.count,
+            mean=self.total / self.count if self.count else 0.0,
+            max=self.max,
+            p50=self.quantile(0.5),
+            p90=self.quantile(0.9),
+            p99=self.quantile(0.99),
+            buckets=[(bound, n) for bound, n in zip(BUCKETS, self.counts) if n])
+
+
+class _EndpointStats(object):
+    def __init__(self):
+        self.statuses = Counter()
+        self.errors = self.retries = self.cached = self.bytes_in = self.bytes_out = 0
+        self.latency = Histogram()
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+    def add(self, record):
+        if record.status is not None:
+            self.statuses[record.status] += 1
+        if record.error is not None:
+            self.errors += 1
+        if record.cached:
+            self.cached += 1
+        self.retries += max(record.attempts - 1, 0)
+        self.bytes_in += record.bytes_in
+        self.bytes_out += record.bytes_out
+        self.latency.add(record.seconds)
+        if record.attempts:
+            for phase, seconds in record.timings.items():
+                self.phases[phase].add(seconds)
+
+    def as_dict(self):
+        return dict(
+            count=self.latency.count,
+            statuses=dict(self.statuses),
+            errors=self.errors,
+            retries=self.retries,
+            cached=self.cached,
+            bytes_in=self.bytes_in,
+            bytes_out=self.bytes_out,
+            latency=self.latency.as_dict(),
+            phases={phase: h.as_dict() for phase, h in self.phases.items()})
+
+
+class RequestStats(object):
+    """Thread-safe aggregation of :py:class:`RequestRecord` per method and endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def add(self, record):
+        key = '%s %s' % (record.method.upper(), record.endpoint)
+        with self._lock:
+            if key not in self._endpoints:
+                self._endpoints[key] = _EndpointStats()
+            self._endpoints[key].add(record)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def as_dict(self):
+        """:return: dict mapping "METHOD endpoint" to a dict of aggregated measurements."""
+        with self._lock:
+            return {key: s.as_dict() for key, s in sorted(self._endpoints.items())}
@@ -0,0 +1,132 @@
+"""Test cases for the asyncio client, imported by `test_aio` on python >= 3.8.
+
+This module uses async syntax, so it must not be imported on older pythons.
+"""
+from __future__ import unicode_literals
+import io
+import json
+import unittest
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:  # pragma: no cover
+    web = None
+
+from pyimeji.api import ChecksumError
+from pyimeji.resource import Item
+from pyimeji.tests.test_api import RESPONSES, PAGED_ITEMS
+
+
+async def _handler(request):
+    if request.path.endswith('/items') and 'size' in request.query:
+        offset, size = int(request.query['offset']), min(int(request.query['size']), 8)
+        page = PAGED_ITEMS[offset:offset + size]
+        return web.json_response(dict(
+            totalNumberOfResults=len(PAGED_ITEMS),
+            numberOfResults=len(page),
+            offset=offset,
+            size=size,
+            results=page))
+    if request.method == 'POST' and request.path == '/rest/items':
+        form = await request.post()
+        assert 'json' in form and 'file' in form
+    res = RESPONSES[(request.path, request.method.lower())]
+    content = res.content if isinstance(res.content, bytes) else json.dumps(res.content)
+    return web.Response(status=res.status, body=content, content_type='application/json')
+
+
+@unittest.skipIf(web is None, 'aiohttp not installed')
+class AsyncImejiTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from pyimeji.aio import AsyncImeji
+
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', _handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.api = AsyncImeji(
+            service_url=str(self.server.make_url('')).rstrip('/'), concurrency=4)
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.server.close()
+
+    async def test_collection(self):
+        collections = await self.api.collections(q='Test')
+        self.assertIn('FKMxUpYdV9N2J4XG', collections)
+        self.assertEqual(self.api.total_number_of_results, 1)
+        self.assertEqual(collections.total_number_of_results, 1)
+        collection = await self.api.collection('FKMxUpYdV9N2J4XG')
+        self.assertEqual(collection.title, 'Research Data')
+        self.assertIn('Wo1JI_oZNyrfxV_t', await collection.items())
+        item = await collection.item_template()
+        self.assertEqual(item.collectionId, collection.id)
+        collection.title = 'New title'
+        collection = await collection.save()
+        self.assertEqual(collection.title, 'Research Data')
+        self.assertIs(await collection.save(), collection)
+        await collection.release()
+        await collection.delete()
+        collection = await self.api.create('collection', title='abc', profile='dhV6XK39_UPrItK5')
+        self.assertEqual(collection.id, 'FKMxUpYdV9N2J4XG')
+        stats = self.api.stats()
+        self.assertEqual(stats['requests']['GET /collections/{id}']['statuses'], {200: 1})
+        self.assertIsNone(stats['pool'])
+
+    async def test_item(self):
+        item = await self.api.item('Wo1JI_oZNyrfxV_t')
+        item = await self.api.update(item, filename='name.png', check_modified=True)
+        self.assertEqual(item.filename, 'virr-image.tif')
+        with self.assertRaises(ChecksumError):
+            await self.api.create('item', collectionId='abc', _file=__file__)
+        item = await Item(dict(collectionId='abc', _file=__file__), self.api).save(checksums=())
+        self.assertEqual(item.id, 'Wo1JI_oZNyrfxV_t')
+        await self.api.delete(item)
+
+    async def test_album(self):
+        album = await self.api.album('MAlOuZ4Y9iDR_')
+        self.assertEqual((await album.member('Wo1JI_oZNyrfxV_t')).id, 'Wo1JI_oZNyrfxV_t')
+        self.assertIsNone(await album.member('abc'))
+        await album.link(['Wo1JI_oZNyrfxV_t'])
+        await album.unlink(['Wo1JI_oZNyrfxV_t'])
+        await album.discard('test comment')
+        self.assertEqual(
+            [d['id'] async for d in album.iter_members(size=5)],
+            [d['id'] for d in PAGED_ITEMS])
+
+    async def test_profile(self):
+        profile = await self.api.profile('dhV6XK39_UPrItK5')
+        self.assertEqual((await profile.copy()).id, profile.id)
+        self.assertEqual(
+            (await profile.item_template()).collectionId, 'provide-your-collection-id-here')
+
+    async def test_sync_only(self):
+        item = await self.api.item('Wo1JI_oZNyrfxV_t')
+        with self.assertRaises(TypeError):
+            item.download(io.BytesIO())
+        collection = await self.api.collection('FKMxUpYdV9N2J4XG')
+        refs = [r async for r in collection.iter_items(size=10, fields=['filename'])]
+        self.assertEqual(refs[0].filename, PAGED_ITEMS[0]['filename'])
+        with self.assertRaises(TypeError):
+            refs[0].metadata
+        with self.assertRaises(TypeError):
+            collection.add_items([('http://example.org/a', None)])
+        album = await self.api.album('MAlOuZ4Y9iDR_')
+        with self.assertRaises(TypeError):
+            album.sync_members(['Wo1JI_oZNyrfxV_t'])
+        for op, args in [
+                ('update_many', ('item', {'status': 'PENDING'})), ('release_many', ('album',)),
+                ('discard_many', ('album', 'comment')), ('delete_many', ('item',))]:
+            with self.assertRaises(TypeError):
+                getattr(self.api, op)(*args, ids=['Wo1JI_oZNyrfxV_t'])
+
+    async def test_iter(self):
+        self.assertEqual(
+            [d['id'] async for d in self.api.iter_collections()], ['FKMxUpYdV9N2J4XG'])
+        collection = await self.api.collection('FKMxUpYdV9N2J4XG')
+        for workers, window in [(None, None), (3, None), (2, 1)]:
+            self.assertEqual(
+                [d['id'] async for d in collection.iter_items(
+                    size=10, workers=workers, window=window)],
+                [d['id'] for d in PAGED_ITEMS])
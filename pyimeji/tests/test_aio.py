@@ -0,0 +1,9 @@
+"""Tests of the asyncio client.
+
+The test cases (see `aio_cases`) use async syntax and `unittest.IsolatedAsyncioTestCase`,
+so they are only loaded on python >= 3.8.
+"""
+import sys
+
+if sys.version_info >= (3, 8):  # pragma: no branch
+    from pyimeji.tests.aio_cases import AsyncImejiTest  # noqa: F401
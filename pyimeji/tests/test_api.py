@@ -3,12 +3,19 @@ from __future__ import unicode_literals
 
 import os
 from datetime import datetime
+from hashlib import md5
+from io import BytesIO
+from shutil import rmtree
+from tempfile import mkdtemp
 from unittest import TestCase
 
-from httmock import all_requests, response, HTTMock
+from httmock import all_requests, urlmatch, response, HTTMock
 from nose.tools import *
+from six.moves.urllib.parse import parse_qsl
 
 from pyimeji.util import pkg_path, jsonload, jsondumps
+from pyimeji.resource import Item
+from pyimeji.api import ImejiError, ChecksumError
 
 SERVICE_URL = 'http://example.org'
 
@@ -53,6 +60,8 @@ for path, method, status, content in [
     ('albums/MAlOuZ4Y9iDR_', 'delete', 204, {}),
     ('albums/MAlOuZ4Y9iDR_', 'get', 200, RESOURCES['album']),
     ('albums/MAlOuZ4Y9iDR_/items', 'get', 200, jsondumps([RESOURCES['item']])),
+    ('albums/MAlOuZ4Y9iDR_/items/Wo1JI_oZNyrfxV_t', 'get', 200, RESOURCES['item']),
+    ('albums/MAlOuZ4Y9iDR_/items/abc', 'get', 404, {"error": {"title": "Not found"}}),
     ('albums/MAlOuZ4Y9iDR_/members/link', 'put', 200, {}),
     ('albums/MAlOuZ4Y9iDR_/members/unlink', 'put', 204, {}),
     ('/', 'head', 200, {})
@@ -68,6 +77,51 @@ def imeji(url, request):
     return response(res.status, res.content, headers, None, 5, request)
 
 
+PAGED_ITEMS = [dict(RESOURCES['item'], id='item%03d' % i) for i in range(45)]
+
+
+@urlmatch(path=r'^/rest/(collections/FKMxUpYdV9N2J4XG|albums/MAlOuZ4Y9iDR_)/items$')
+def paged_items(url, request):
+    """Serves `PAGED_ITEMS` honoring the offset and size parameters of the request.
+
+    Like real servers, we cap the page size.
+    """
+    params = dict(parse_qsl(url.query))
+    offset, size = int(params.get('offset', 0)), min(int(params.get('size', 20)), 8)
+    page = PAGED_ITEMS[offset:offset + size]
+    content = dict(
+        totalNumberOfResults=len(PAGED_ITEMS),
+        numberOfResults=len(page),
+        offset=offset,
+        size=size,
+        results=page)
+    return response(200, content, {'content-type': 'application/json'}, None, 5, request)
+
+
+@urlmatch(path=r'^/rest/items/item\d+$')
+def paged_item(url, request):
+    """Serves the items in `PAGED_ITEMS`."""
+    item = PAGED_ITEMS[int(url.path[-3:])]
+    return response(200, item, {'content-type': 'application/json'}, None, 5, request)
+
+
+FILE_CONTENT = b''.join(('%05d' % i).encode('ascii') for i in range(2000))
+
+
+@urlmatch(path=r'^/image\.jpg$')
+def download(url, request):
+    """Serves `FILE_CONTENT`, honoring HTTP Range requests."""
+    offset = int(request.headers.get('Range', 'bytes=0-')[len('bytes='):-1])
+    if offset >= len(FILE_CONTENT):
+        return response(
+            416, b'', {'Content-Range': 'bytes */%s' % len(FILE_CONTENT)}, None, 5, request)
+    return response(
+        206 if offset else 200,
+        FILE_CONTENT[offset:],
+        {'Content-Length': str(len(FILE_CONTENT) - offset)},
+        None, 5, request)
+
+
 class ApiTest(TestCase):
     def setUp(self):
         from pyimeji.api import Imeji
@@ -79,6 +133,7 @@ class ApiTest(TestCase):
             album = self.api.album(list(albums.keys())[0])
             assert 'Wo1JI_oZNyrfxV_t' in album.members()
             assert album.id in album.member('Wo1JI_oZNyrfxV_t')._path()
+            self.assertIsNone(album.member('abc'))
             if not self.api.service_mode_private:
                 album.release()
                 album = self.api.album(album.id)
@@ -86,6 +141,32 @@ class ApiTest(TestCase):
                 album.unlink(['Wo1JI_oZNyrfxV_t'])
                 album.discard('test comment')
 
+    def test_json_backend(self):
+        import json
+        from pyimeji.api import Imeji
+        from pyimeji.cache import MemoryCache
+
+        calls = []
+
+        class Backend(object):
+            def loads(self, s):
+                calls.append('loads')
+                return json.loads(s.decode('utf8') if isinstance(s, bytes) else s)
+
+            def dumps(self, obj):
+                calls.append('dumps')
+                return json.dumps(obj)
+
+        with HTTMock(imeji):
+            api = Imeji(service_url=SERVICE_URL, cache=MemoryCache())
+            api.json_backend = ('custom', Backend())
+            api.album('MAlOuZ4Y9iDR_')
+            # answered from the cache:
+            album = api.album('MAlOuZ4Y9iDR_')
+            self.assertEqual(calls, ['loads', 'loads'])
+            album.link(['Wo1JI_oZNyrfxV_t'])
+            self.assertEqual(calls[2:4], ['dumps', 'loads'])
+
     def test_collection(self):
         with HTTMock(imeji):
             collections = self.api.collections()
@@ -95,6 +176,9 @@ class ApiTest(TestCase):
             self.assertEqual(collection.title, 'Research Data')
             collection.title = 'New title'
             self.assertIsInstance(collection.createdDate, datetime)
+            self.assertIs(collection.createdDate, collection.createdDate)
+            collection.versionDate = '2016-06-15T10:04:15 +0200'
+            self.assertEqual(collection.versionDate.year, 2016)
             self.assertEqual(collection.title, 'New title')
 
             collection_template_item = collection.item_template()
@@ -125,6 +209,8 @@ class ApiTest(TestCase):
             self.assertEqual(self.api.number_of_results,1)
             self.assertEqual(self.api.offset,0)
             self.assertEqual(self.api.size,1)
+            self.assertEqual(collections.total_number_of_results, 1)
+            self.assertEqual(collections.offset, 0)
 
             self.assertIn('FKMxUpYdV9N2J4XG', collections)
             with self.assertRaises(ValueError):
@@ -160,6 +246,304 @@ class ApiTest(TestCase):
             with self.assertRaises(AttributeError):
                 item3=self.api.update(item3, metadata='some metadata')
 
+    def test_changed_fields(self):
+        from pyimeji.api import ConflictError
+
+        requests = []
+        self.api.add_hook('after_request', lambda r: requests.append(r.method))
+        with HTTMock(imeji):
+            item = self.api.item('Wo1JI_oZNyrfxV_t')
+            self.assertEqual(item.changed_fields, [])
+            self.assertIs(item.save(), item)
+            item.filename = item.filename
+            self.assertIs(self.api.update(item, status=item.status), item)
+            self.assertEqual(requests, ['get'])
+
+            item.metadata['new'] = 'value'
+            item.filename = 'name.png'
+            self.assertEqual(item.changed_fields, ['filename', 'metadata'])
+            self.assertIsInstance(item.save(), Item)
+            self.assertEqual(requests, ['get', 'put'])
+
+            item._json['modifiedDate'] = '2014-11-20T09:31:15 +0000'
+            self.assertIsInstance(item.save(check_modified=True), Item)
+            self.assertEqual(requests, ['get', 'put', 'get', 'put'])
+
+            item._json['modifiedDate'] = '2014-10-20T10:31:15 +0100'
+            with self.assertRaises(ConflictError) as ctx:
+                item.save(check_modified=True)
+            self.assertEqual(ctx.exception.actual.month, 11)
+            self.assertEqual(requests, ['get', 'put', 'get', 'put', 'get'])
+
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            self.assertIs(collection.save(), collection)
+            collection.title = 'new title'
+            self.assertIsNot(collection.save(), collection)
+            self.assertEqual(requests[-2:], ['get', 'put'])
+
+            # Objects created locally are always sent.
+            item = Item({'id': 'Wo1JI_oZNyrfxV_t', 'filename': 'name.png'}, self.api)
+            self.assertEqual(item.changed_fields, ['filename', 'id'])
+            self.assertIsNot(item.save(), item)
+            self.api.create('collection', id='FKMxUpYdV9N2J4XG', title='title')
+            self.assertEqual(requests[-2:], ['put', 'put'])
+
+    def test_bulk_many(self):
+        from pyimeji.api import Imeji
+
+        sent = []
+
+        @urlmatch(path=r'^/rest/(items|albums)(/item\d+(/release|/discard)?)?$')
+        def items(url, request):
+            sent.append((request.method, url.path[len('/rest'):]))
+            if url.path in ('/rest/items', '/rest/albums'):
+                params = dict(parse_qsl(url.query))
+                offset = int(params.get('offset', 0))
+                page = PAGED_ITEMS[offset:offset + int(params['size'])]
+                content = dict(
+                    totalNumberOfResults=len(PAGED_ITEMS), numberOfResults=len(page),
+                    offset=offset, size=len(page), results=page)
+            else:
+                if 'item007' in url.path and request.method != 'GET':
+                    return response(500, {}, {}, None, 5, request)
+                content = PAGED_ITEMS[int(url.path.split('/')[3][-3:])]
+            status = dict(DELETE=204).get(request.method, 200)
+            return response(
+                status, content, {'content-type': 'application/json'}, None, 5, request)
+
+        api = Imeji(service_url=SERVICE_URL, health_check=False, retry=False)
+        with HTTMock(items):
+            with self.assertRaises(ValueError):
+                api.release_many('item', ['item001'])
+            op = api.release_many('album', ['item001', 'item007'])
+            results = {r.record: r for r in op}
+            self.assertTrue(results['item001'].ok)
+            self.assertIsInstance(results['item007'].error, ImejiError)
+            self.assertEqual((op.progress.succeeded, op.progress.failed), (1, 1))
+            self.assertEqual(op.progress.errors, {'ImejiError': 1})
+            self.assertIn(('PUT', '/albums/item001/release'), sent)
+
+            del sent[:]
+            progress = api.delete_many('item', q='x', workers=8).run()
+            self.assertEqual((progress.succeeded, progress.failed), (44, 1))
+            self.assertEqual(len([m for m, _ in sent if m == 'DELETE']), 45)
+
+            del sent[:]
+            api.discard_many('album', 'obsolete', ['item002']).run()
+            self.assertEqual(sent, [('PUT', '/albums/item002/discard')])
+
+            del sent[:]
+            op = api.update_many(
+                'item', {'filename': PAGED_ITEMS[3]['filename']}, ['item003'])
+            self.assertEqual(op.run().succeeded, 1)
+            self.assertEqual(sent, [('GET', '/items/item003')])
+            op = api.update_many(
+                'item', lambda item: item.metadata.update(x=1), ['item003', 'item004'])
+            self.assertEqual(op.run().succeeded, 2)
+            self.assertEqual(
+                sorted(sent),
+                [('GET', '/items/item003'), ('GET', '/items/item003'), ('GET', '/items/item004'),
+                 ('PUT', '/items/item003'), ('PUT', '/items/item004')])
+            with self.assertRaises(ValueError):
+                api.delete_many('item')
+
+    def test_iter(self):
+        with HTTMock(imeji):
+            self.assertEqual(
+                [d['id'] for d in self.api.iter_collections(q='Test')], ['FKMxUpYdV9N2J4XG'])
+            self.assertEqual([d['id'] for d in self.api.iter_items()], ['Wo1JI_oZNyrfxV_t'])
+            self.assertRaises(AttributeError, getattr, self.api, 'iter_item')
+
+        with HTTMock(paged_items, imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            self.assertEqual(
+                [d['id'] for d in collection.iter_items(size=10)],
+                [d['id'] for d in PAGED_ITEMS])
+            self.assertEqual(len(list(collection.iter_items(size=10, offset=40))), 5)
+            album = self.api.album('MAlOuZ4Y9iDR_')
+            self.assertEqual(len(list(album.iter_members(size=7, q='x'))), len(PAGED_ITEMS))
+
+    def test_references(self):
+        from pyimeji.resource import Reference, Collection
+
+        with HTTMock(paged_items, paged_item, imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            refs = list(collection.iter_items(fields=['filename', 'status'], workers=2))
+            self.assertEqual(len(refs), len(PAGED_ITEMS))
+            self.assertIsInstance(refs[1], Reference)
+            self.assertEqual(refs[1].id, 'item001')
+            self.assertEqual(refs[1].filename, 'virr-image.tif')
+            self.assertIsNone(refs[1]._obj)
+            self.assertEqual(refs[1].metadata, {'titel': 'title'})
+            self.assertIsInstance(refs[1].resource, Item)
+            self.assertRaises(AttributeError, getattr, refs[1], '_x')
+            self.assertEqual(refs[2], list(collection.iter_items(fields=[]))[2])
+            self.assertNotEqual(refs[2], refs[3])
+            self.assertEqual(len(set(refs)), len(refs))
+            self.assertIn('item002', repr(refs[2]))
+
+        with HTTMock(imeji):
+            collections = self.api.collections(fields=['title'])
+            self.assertEqual(collections['FKMxUpYdV9N2J4XG'].title, 'Research Data')
+            self.assertIsInstance(
+                collections['FKMxUpYdV9N2J4XG'].resource, Collection)
+            ref = list(self.api.iter_collections(fields=['title']))[0]
+            self.assertEqual(ref.description, 'Test for research data')
+            album = self.api.album('MAlOuZ4Y9iDR_')
+            self.assertIsInstance(album.members(fields=[])['Wo1JI_oZNyrfxV_t'], Reference)
+
+    def test_iter_prefetched(self):
+        with HTTMock(imeji):
+            # Without paging information we fall back to sequential iteration.
+            self.assertEqual(len(list(self.api.iter_items(workers=4))), 1)
+
+        with HTTMock(paged_items, imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            for size, workers, window in [(10, 3, None), (5, 4, 1), (100, 2, 3)]:
+                self.assertEqual(
+                    [d['id'] for d in collection.iter_items(
+                        size=size, workers=workers, window=window)],
+                    [d['id'] for d in PAGED_ITEMS])
+            self.assertEqual(
+                [d['id'] for d in collection.iter_items(size=5, offset=42, workers=2)],
+                [d['id'] for d in PAGED_ITEMS[42:]])
+            album = self.api.album('MAlOuZ4Y9iDR_')
+            members = album.iter_members(size=5, workers=4)
+            self.assertEqual(next(members)['id'], PAGED_ITEMS[0]['id'])
+            members.close()
+
+    def test_sync_members(self):
+        import json
+        import threading
+
+        requests = []
+        lock = threading.Lock()
+
+        @urlmatch(path=r'^/rest/albums/MAlOuZ4Y9iDR_/members/(link|unlink)$')
+        def members(url, request):
+            op = url.path.split('/')[-1]
+            with lock:
+                requests.append((op, json.loads(request.body)))
+                if len(requests) == 1:
+                    return response(500, {}, {}, None, 5, request)
+            return response(
+                200 if op == 'link' else 204, {}, {'content-type': 'application/json'},
+                None, 5, request)
+
+        desired = [d['id'] for d in PAGED_ITEMS[:20]] + ['new%03d' % i for i in range(10)]
+        with HTTMock(members, paged_items, imeji):
+            album = self.api.album('MAlOuZ4Y9iDR_')
+            op = album.sync_members(desired + desired[:3], chunk_size=4, workers=2, retries=1)
+            self.assertEqual(requests, [])
+            results = list(op)
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(sum(r.attempts for r in results), len(results) + 1)
+        self.assertEqual(len(requests), len(results) + 1)
+        linked = sorted(set(i for r in results if r.record[0] == 'link' for i in r.record[1]))
+        self.assertEqual(linked, ['new%03d' % i for i in range(10)])
+        unlinked = [i for r in results if r.record[0] == 'unlink' for i in r.record[1]]
+        self.assertEqual(sorted(unlinked), [d['id'] for d in PAGED_ITEMS[20:]])
+        self.assertTrue(all(len(r.record[1]) <= 4 for r in results))
+
+    def test_add_items(self):
+        with HTTMock(imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            op = collection.add_items(
+                [(__file__, {'filename': 'a.py'}),
+                 ('http://example.org/image.jpg', None),
+                 dict(_file=__file__),
+                 (__file__, {'metadata': 'not allowed'})] * 5,
+                workers=3,
+                ordered=True)
+            results = list(op)
+            self.assertEqual(len(results), 20)
+            self.assertEqual([r.ok for r in results], [True, True, True, False] * 5)
+            self.assertIsInstance(results[0].value, Item)
+            self.assertIsInstance(results[3].error, AttributeError)
+            self.assertEqual(op.progress.succeeded, 15)
+            self.assertEqual(op.progress.failed, 5)
+            self.assertEqual(op.progress.bytes, 10 * os.path.getsize(__file__))
+            self.assertIn('15 succeeded', str(op.progress))
+
+            op = collection.add_items(iter([('http://example.org/image.jpg', None)] * 10))
+            self.assertEqual(op.run().succeeded, 10)
+
+    def test_download(self):
+        tmp = mkdtemp()
+        try:
+            with HTTMock(download, imeji):
+                item = self.api.item('Wo1JI_oZNyrfxV_t')
+                self.assertEqual(item.download().content, FILE_CONTENT)
+                path = os.path.join(tmp, 'file')
+                self.assertRaises(ChecksumError, item.download, path)
+                self.assertEqual(item.download(path, checksums=()), len(FILE_CONTENT))
+                item.checksumMd5 = md5(FILE_CONTENT).hexdigest()
+
+                self.assertEqual(
+                    item.download(path, chunk_size=1000, checksums=('md5', 'sha256')),
+                    len(FILE_CONTENT))
+                with open(path, 'rb') as fp:
+                    self.assertEqual(fp.read(), FILE_CONTENT)
+
+                with open(path, 'wb') as fp:
+                    fp.write(FILE_CONTENT[:1234])
+                self.assertEqual(item.download(path, resume=True), len(FILE_CONTENT) - 1234)
+                with open(path, 'rb') as fp:
+                    self.assertEqual(fp.read(), FILE_CONTENT)
+                self.assertEqual(item.download(path, resume=True), 0)
+                self.assertEqual(item.download(path), len(FILE_CONTENT))
+
+                fp = BytesIO()
+                item.download(fp)
+                self.assertEqual(fp.getvalue(), FILE_CONTENT)
+
+                with open(path, 'wb') as fp:
+                    fp.write(b'x' + FILE_CONTENT[1:1234])
+                self.assertRaises(ChecksumError, item.download, path, resume=True)
+
+                with open(path, 'wb') as fp:
+                    fp.write(FILE_CONTENT + b'x')
+                self.assertRaises(ImejiError, item.download, path, resume=True)
+
+            closed = []
+
+            @urlmatch(path=r'^/image\.jpg$')
+            def missing(url, request):
+                res = response(404, b'', {}, None, 5, request)
+                res.close = lambda: closed.append(True)
+                return res
+
+            # The connection of a failed streamed request is released.
+            with HTTMock(missing, imeji):
+                self.assertRaises(ImejiError, item.download, path)
+            self.assertEqual(closed, [True])
+        finally:
+            rmtree(tmp)
+
+    def test_upload_checksum(self):
+        with open(__file__, 'rb') as fp:
+            checksum = md5(fp.read()).hexdigest()
+
+        def upload(checksum):
+            @urlmatch(path=r'^/rest/items$', method='post')
+            def handler(url, request):
+                body = request.body.read()
+                self.assertIn(b'def test_upload_checksum', body)
+                return response(
+                    201, dict(RESOURCES['item'], checksumMd5=checksum),
+                    {'content-type': 'application/json'}, None, 5, request)
+            return handler
+
+        with HTTMock(upload(checksum)):
+            item = self.api.create('item', collectionId='abc', _file=__file__)
+            self.assertEqual(item.checksumMd5, checksum)
+
+        with HTTMock(upload('abc')):
+            with self.assertRaises(ChecksumError) as ctx:
+                self.api.create('item', collectionId='abc', _file=__file__)
+            self.assertEqual(ctx.exception.actual, checksum)
+            Item(dict(collectionId='abc', _file=__file__), self.api).save(checksums=())
+
     def test_profile(self):
         with HTTMock(imeji):
             profile = self.api.profile('dhV6XK39_UPrItK5')
@@ -182,13 +566,79 @@ class ApiTest(TestCase):
             self.assertIsInstance(res, Collection)
 
 
-class ServiceTest(TestCase):
-    from pyimeji.api import ImejiError
+class ConcurrencyTest(TestCase):
+    def test_shared_client(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from pyimeji.api import Imeji
+
+        api = Imeji(service_url=SERVICE_URL, health_check=False)
+        with HTTMock(paged_items, imeji):
+            collection = api.collection('FKMxUpYdV9N2J4XG')
+
+            def listing(n):
+                offset = n % len(PAGED_ITEMS)
+                page = collection.items(offset=offset, size=8)
+                expected = [d['id'] for d in PAGED_ITEMS[offset:offset + 8]]
+                return (
+                    list(page) == expected
+                    and page.offset == api.offset == offset
+                    and page.number_of_results == api.number_of_results == len(expected)
+                    and page.total_number_of_results == len(PAGED_ITEMS)
+                    and len(list(collection.iter_items(size=8))) == len(PAGED_ITEMS))
+
+            with ThreadPoolExecutor(16) as executor:
+                results = list(executor.map(listing, range(400)))
+        self.assertTrue(all(results))
+        # 1 collection, 400 listings, 400 * 6 pages iterated
+        self.assertEqual(
+            sum(s['count'] for s in api.stats()['requests'].values()), 1 + 400 + 400 * 6)
+        self.assertIsNone(api.offset)
+
+
+class ImportTest(TestCase):
+    def test_lazy_imports(self):
+        import sys
+        import subprocess
+
+        out = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, pyimeji.api, pyimeji.cli; '
+            'print(" ".join(sorted(set(sys.modules) & '
+            '{"requests", "dateutil", "pyimeji.resource", "concurrent.futures"})))'])
+        self.assertEqual(out.strip(), b'')
 
+
+class ServiceTest(TestCase):
     @raises(ImejiError)
     def test_service_setup(self):
         from pyimeji.api import Imeji
-        Imeji(service_url=SERVICE_URL + "FAKE")
+        # The availability of the service is only checked upon the first request.
+        api = Imeji(service_url=SERVICE_URL + "FAKE")
+        api.items()
+
+    def test_health_check(self):
+        from pyimeji.api import Imeji, _health_checked
+
+        heads = []
+
+        @urlmatch(method='head')
+        def head(url, request):
+            heads.append(url)
+            return response(200, b'', {}, None, 5, request)
+
+        _health_checked.pop(SERVICE_URL, None)
+        with HTTMock(head, imeji):
+            api = Imeji(service_url=SERVICE_URL)
+            self.assertEqual(heads, [])
+            api.items()
+            Imeji(service_url=SERVICE_URL).items()
+            self.assertEqual(len(heads), 1)
+            api.health_check_ttl = 0
+            api.items()
+            self.assertEqual(len(heads), 2)
+            _health_checked.pop(SERVICE_URL, None)
+            Imeji(service_url=SERVICE_URL, health_check=False).items()
+            self.assertEqual(len(heads), 2)
 
     @raises(ImejiError)
     def test_service_unavailable_in_meantime_setup(self):
@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+import threading
+import time
+from unittest import TestCase
+
+
+class BulkTest(TestCase):
+    def test_bulk_operation(self):
+        from pyimeji.bulk import BulkOperation
+
+        def f(i):
+            if i % 5 == 0:
+                raise ValueError(i)
+            time.sleep(0.001 * (i % 3))
+            return i * 2
+
+        op = BulkOperation(f, range(50), workers=4)
+        results = list(op)
+        self.assertEqual(sorted(r.record for r in results), list(range(50)))
+        self.assertEqual(
+            sorted(r.value for r in results if r.ok), [i * 2 for i in range(50) if i % 5])
+        self.assertEqual(op.progress.failed, 10)
+        self.assertEqual(
+            [r.record for r in BulkOperation(f, range(20), workers=3, ordered=True)],
+            list(range(20)))
+
+    def test_bounded_window(self):
+        from pyimeji.bulk import BulkOperation
+
+        consumed = []
+        lock = threading.Lock()
+
+        def records():
+            for i in range(100):
+                with lock:
+                    consumed.append(i)
+                yield i
+
+        op = iter(BulkOperation(lambda i: i, records(), workers=2, window=3))
+        next(op)
+        self.assertLessEqual(len(consumed), 4)
+        op.close()
+
+    def test_retries(self):
+        from pyimeji.bulk import BulkOperation, chunks
+
+        attempts = {}
+        lock = threading.Lock()
+
+        def f(i):
+            with lock:
+                attempts[i] = attempts.get(i, 0) + 1
+                if attempts[i] <= i % 3:
+                    raise ValueError(i)
+            return i
+
+        results = list(BulkOperation(f, range(9), workers=3, retries=1, backoff=0.001))
+        self.assertEqual(sorted(r.record for r in results if r.ok), [0, 1, 3, 4, 6, 7])
+        self.assertEqual(
+            sorted((r.record, r.attempts) for r in results if not r.ok), [(2, 2), (5, 2), (8, 2)])
+        self.assertEqual(list(chunks(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_rate(self):
+        from pyimeji.bulk import BulkOperation
+
+        start = time.time()
+        op = BulkOperation(lambda i: i, range(11), workers=4, rate=100)
+        self.assertEqual(op.run().succeeded, 11)
+        self.assertGreaterEqual(time.time() - start, 0.1)
+
+    def test_awaitable(self):
+        from pyimeji.bulk import BulkOperation
+
+        class Awaitable(object):
+            def __await__(self):  # pragma: no cover
+                yield
+
+        results = list(BulkOperation(lambda i: Awaitable(), range(3)))
+        self.assertTrue(all(isinstance(r.error, TypeError) for r in results))
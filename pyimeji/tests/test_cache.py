@@ -0,0 +1,240 @@
+from __future__ import unicode_literals
+import os
+import threading
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from httmock import urlmatch, response, HTTMock
+
+from pyimeji.tests.test_api import RESOURCES, SERVICE_URL, imeji
+
+
+def _fill(directory, n):
+    """Write to a shared DiskCache - run in separate processes by the tests."""
+    from pyimeji.cache import DiskCache, CacheEntry
+
+    cache = DiskCache(directory, max_size=20000)
+    for i in range(200):
+        uri = 'http://x/rest/items/%s' % (i % 30)
+        cache.set('%s-%s' % (uri, i % 7), CacheEntry(uri, os.urandom(100 + (i * n) % 400)))
+        if i % 10 == n:
+            cache.invalidate('http://x/rest/items/%s' % (i % 30))
+
+
+class CacheTest(TestCase):
+    def setUp(self):
+        from pyimeji.api import Imeji
+        from pyimeji.cache import MemoryCache
+
+        self.requests = []
+        with HTTMock(imeji):
+            self.api = Imeji(service_url=SERVICE_URL, cache=MemoryCache(size=3, ttl=60))
+
+    def server(self, etag='"v1"'):
+        @urlmatch(path=r'^/rest/')
+        def handler(url, request):
+            self.requests.append((request.method, url.path))
+            if request.method == 'GET' and url.path == '/rest/collections/FKMxUpYdV9N2J4XG':
+                if request.headers.get('If-None-Match') == etag:
+                    return response(304, b'', {}, None, 5, request)
+                return response(
+                    200, RESOURCES['collection'],
+                    {'content-type': 'application/json', 'ETag': etag}, None, 5, request)
+        return handler
+
+    def test_cache(self):
+        with HTTMock(self.server(), imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            collection.title = 'changed'
+            self.assertEqual(self.api.collection('FKMxUpYdV9N2J4XG').title, 'Research Data')
+            self.assertEqual(len(self.requests), 1)
+            self.api.collections()
+            self.api.collections()
+            self.assertEqual(self.api.total_number_of_results, 1)
+            self.assertEqual(len(self.requests), 2)
+            self.assertEqual(self.api.cache.hits, 2)
+
+            # Parameters are part of the key.
+            self.api.collections(q='x')
+            self.assertEqual(len(self.requests), 3)
+
+            # Least recently used entries are evicted.
+            self.api.profile('dhV6XK39_UPrItK5')
+            self.api.item('Wo1JI_oZNyrfxV_t')
+            self.api.collections()
+            self.assertEqual(len(self.requests), 6)
+
+    def test_revalidation(self):
+        self.api.cache.ttl = 0
+        with HTTMock(self.server(), imeji):
+            self.api.collection('FKMxUpYdV9N2J4XG')
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            self.assertEqual(collection.title, 'Research Data')
+            self.assertEqual(self.api.cache.revalidations, 1)
+            self.assertEqual(self.api.cache.stats()['misses'], 2)
+
+    def test_invalidation(self):
+        with HTTMock(self.server(), imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            self.api.collections()
+            collection.release()
+            self.assertEqual(self.api.cache.stats()['size'], 0)
+            self.api.collection('FKMxUpYdV9N2J4XG')
+            self.api.item('Wo1JI_oZNyrfxV_t')
+            self.api.create('collection', title='abc')
+            self.assertEqual(self.api.cache.stats()['size'], 2)
+            collection.delete()
+            self.assertEqual(self.api.cache.stats()['size'], 1)
+
+    def test_no_cache(self):
+        with HTTMock(self.server(), imeji):
+            self.api.collection('FKMxUpYdV9N2J4XG')
+            self.api._req(
+                '/collections/FKMxUpYdV9N2J4XG', headers={'Cache-Control': 'no-cache'})
+            self.assertEqual(len(self.requests), 2)
+            stats = self.api.cache.stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['revalidations']), (0, 2, 1))
+
+    def test_member_invalidation(self):
+        with HTTMock(imeji):
+            album = self.api.album('MAlOuZ4Y9iDR_')
+            album.member('Wo1JI_oZNyrfxV_t')
+            item = self.api.item('Wo1JI_oZNyrfxV_t')
+            self.assertEqual(self.api.cache.stats()['size'], 3)
+            item.delete()
+            # Only the album itself is left.
+            self.assertEqual(self.api.cache.stats()['size'], 1)
+            album.member('Wo1JI_oZNyrfxV_t')
+            self.assertEqual(self.api.cache.stats()['hits'], 0)
+
+    def test_configured_cache(self):
+        from pyimeji.api import Imeji
+        from pyimeji.config import Config
+        from pyimeji.cache import MemoryCache
+
+        cfg = Config()
+        cfg.add_section('cache')
+        cfg.set('cache', 'ttl', '5')
+        with HTTMock(imeji):
+            self.assertEqual(Imeji(cfg, service_url=SERVICE_URL).cache.ttl, 5)
+            self.assertIsInstance(Imeji(service_url=SERVICE_URL, cache=True).cache, MemoryCache)
+            self.assertIsNone(Imeji(service_url=SERVICE_URL).cache)
+
+
+class DiskCacheTest(CacheTest):
+    def setUp(self):
+        from pyimeji.api import Imeji
+        from pyimeji.cache import DiskCache
+
+        self.tmp = mkdtemp()
+        self.requests = []
+        with HTTMock(imeji):
+            self.api = Imeji(service_url=SERVICE_URL, cache=DiskCache(self.tmp, ttl=60))
+
+    def tearDown(self):
+        rmtree(self.tmp, ignore_errors=True)
+
+    def test_cache(self):
+        from pyimeji.api import Imeji
+        from pyimeji.cache import DiskCache
+
+        with HTTMock(self.server(), imeji):
+            self.api.collection('FKMxUpYdV9N2J4XG')
+            self.api.collections()
+            # A new client - e.g. in another process - finds the cached responses.
+            api = Imeji(service_url=SERVICE_URL, cache=DiskCache(self.tmp, ttl=60))
+            self.assertEqual(api.collection('FKMxUpYdV9N2J4XG').title, 'Research Data')
+            self.assertIn('FKMxUpYdV9N2J4XG', api.collections())
+            self.assertEqual(len(self.requests), 2)
+            self.assertEqual(api.cache.hits, 2)
+
+    def test_eviction(self):
+        from pyimeji.cache import DiskCache, CacheEntry
+
+        cache = DiskCache(self.tmp, max_size=2500, access_resolution=0)
+        data = [os.urandom(1000) for i in range(10)]
+        for i in range(10):
+            cache.set('key%s' % i, CacheEntry('uri%s' % i, data[i]))
+            cache.get('key0')
+        self.assertEqual(cache.get('key0')[0].data, data[0])
+        self.assertIsNone(cache.get('key5')[0])
+        self.assertLessEqual(len(cache), 3)
+
+    def test_size_accounting(self):
+        from pyimeji.cache import DiskCache, CacheEntry
+
+        cache = DiskCache(self.tmp, max_size=100000)
+        for i in range(10):
+            cache.set('key%s' % i, CacheEntry('http://x/rest/items/%s' % (i % 3), b'a' * 100))
+        cache.set('key0', CacheEntry('http://x/rest/items/0', os.urandom(1000)))
+        cache.set('list', CacheEntry('http://x/rest/items', b'[]', is_list=True))
+        cache.invalidate('http://x/rest/items/1')
+
+        def total():
+            return [cache._db.execute(sql).fetchone()[0] for sql in [
+                "SELECT value FROM meta WHERE key = 'size'", "SELECT sum(size) FROM entry"]]
+
+        self.assertEqual(len(cache), 7)
+        size, actual = total()
+        self.assertEqual(size, actual)
+        # The total is initialized from the entries of an existing database.
+        cache._db.execute("DELETE FROM meta")
+        cache._db.commit()
+        cache = DiskCache(self.tmp)
+        self.assertEqual(total(), [size, size])
+        cache.clear()
+        self.assertEqual(total(), [0, None])
+
+        # Hits within the access resolution do not write to the database.
+        cache.set('key', CacheEntry('uri', b'data'))
+        accessed = cache._db.execute("SELECT accessed FROM entry").fetchone()[0]
+        cache.get('key')
+        self.assertEqual(
+            cache._db.execute("SELECT accessed FROM entry").fetchone()[0], accessed)
+
+    def test_processes(self):
+        from multiprocessing import Process
+        from pyimeji.cache import DiskCache
+
+        processes = [Process(target=_fill, args=(self.tmp, n)) for n in range(6)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        db = DiskCache(self.tmp)._db
+        size = db.execute("SELECT value FROM meta WHERE key = 'size'").fetchone()[0]
+        self.assertEqual(size, db.execute("SELECT sum(size) FROM entry").fetchone()[0])
+        self.assertLessEqual(size, 20000)
+
+    def test_modified_date(self):
+        from pyimeji.cache import CacheEntry
+
+        entry = CacheEntry('uri', b'{}', modified_date='2014-11-19T14:50:21 +0100')
+        self.assertEqual(entry.headers(), {'If-Modified-Since': 'Wed, 19 Nov 2014 13:50:21 GMT'})
+
+    def test_threads(self):
+        from pyimeji.cache import CacheEntry
+
+        def work(n):
+            for i in range(20):
+                self.api.cache.set('%s-%s' % (n, i), CacheEntry('uri', b'{}'))
+                self.api.cache.get('%s-%s' % (n, i))
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.api.cache.stats()['size'], 80)
+
+    def test_configured_cache(self):
+        from pyimeji.config import Config
+        from pyimeji.cache import configured_cache, DiskCache
+
+        cfg = Config()
+        cfg.add_section('cache')
+        cfg.set('cache', 'type', 'disk')
+        cfg.set('cache', 'directory', self.tmp)
+        self.assertIsInstance(configured_cache(cfg), DiskCache)
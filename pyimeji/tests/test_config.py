@@ -33,3 +33,10 @@ option = 12
 
         cfg = Config(config_dir=self.cfg)
         self.assertEqual(cfg.get('section', 'option'), '12')
+
+    def test_no_create(self):
+        from pyimeji.config import Config
+
+        cfg = Config(config_dir=self.cfg, create=False)
+        self.assertFalse(os.path.exists(self.cfg))
+        self.assertEqual(cfg.get('service', 'url', 'default'), 'default')
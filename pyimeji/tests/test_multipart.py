@@ -0,0 +1,66 @@
+from __future__ import unicode_literals
+import os
+from email.parser import BytesParser
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+
+class MultipartTest(TestCase):
+    def setUp(self):
+        self.tmp = mkdtemp()
+        self.path = os.path.join(self.tmp, 'data.bin')
+        self.content = os.urandom(100000)
+        with open(self.path, 'wb') as fp:
+            fp.write(self.content)
+
+    def tearDown(self):
+        rmtree(self.tmp, ignore_errors=True)
+
+    def _parse(self, encoder, chunk_size):
+        body, chunk = [], encoder.read(chunk_size)
+        while chunk:
+            body.append(chunk)
+            chunk = encoder.read(chunk_size)
+        body = b''.join(body)
+        self.assertEqual(len(body), len(encoder))
+        msg = BytesParser().parsebytes(
+            ('Content-Type: %s\r\n\r\n' % encoder.content_type).encode('utf8') + body)
+        return {p.get_param('name', header='content-disposition'): p for p in msg.get_payload()}
+
+    def test_encoder(self):
+        from pyimeji.multipart import MultipartEncoder
+
+        progress = []
+        for use_mmap in [False, True]:
+            for chunk_size in [7, 4096, -1]:
+                encoder = MultipartEncoder(
+                    [('json', '{"title": "ä"}')],
+                    files=[('file', self.path)],
+                    callback=lambda n, total: progress.append((n, total)),
+                    use_mmap=use_mmap)
+                parts = self._parse(encoder, chunk_size)
+                self.assertEqual(
+                    parts['json'].get_payload(decode=True), '{"title": "ä"}'.encode('utf8'))
+                self.assertEqual(parts['file'].get_filename(), 'data.bin')
+                self.assertEqual(parts['file'].get_payload(decode=True), self.content)
+                self.assertEqual(progress[-1], (len(encoder), len(encoder)))
+                self.assertEqual(encoder.read(), b'')
+
+    def test_close(self):
+        from pyimeji.multipart import MultipartEncoder
+
+        encoder = MultipartEncoder([], files=[('file', self.path)])
+        encoder.read(1000)
+        part = [p for p in encoder._parts if hasattr(p, 'path')][0]
+        self.assertIsNotNone(part._fp)
+        encoder.close()
+        self.assertIsNone(part._fp)
+
+        # Files are closed as soon as they have been read completely.
+        encoder = MultipartEncoder([('a', b'b')], files=[('file', self.path)])
+        part = [p for p in encoder._parts if hasattr(p, 'path')][0]
+        encoder.read(1000)
+        self.assertIsNotNone(part._fp)
+        self.assertEqual(len(b''.join(encoder)), len(encoder) - 1000)
+        self.assertIsNone(part._fp)
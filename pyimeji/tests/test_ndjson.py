@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+import os
+import gzip
+import json
+from io import BytesIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from httmock import HTTMock, urlmatch, response
+
+from pyimeji.tests.test_api import SERVICE_URL, PAGED_ITEMS, RESOURCES, imeji, paged_items, \
+    paged_item
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        from pyimeji.api import Imeji
+
+        self.tmp = mkdtemp()
+        self.api = Imeji(service_url=SERVICE_URL)
+
+    def tearDown(self):
+        rmtree(self.tmp, ignore_errors=True)
+
+    def test_export(self):
+        from pyimeji.ndjson import export
+
+        with HTTMock(paged_items, paged_item, imeji):
+            for container in [
+                self.api.collection('FKMxUpYdV9N2J4XG'), self.api.album('MAlOuZ4Y9iDR_')
+            ]:
+                for hydrate, workers in [(False, 1), (False, 3), (True, 4)]:
+                    fp = BytesIO()
+                    self.assertEqual(
+                        export(container, fp, hydrate=hydrate, workers=workers, size=10),
+                        len(PAGED_ITEMS))
+                    lines = fp.getvalue().decode('utf8').splitlines()
+                    self.assertEqual([json.loads(l) for l in lines], PAGED_ITEMS)
+
+    def test_open_output(self):
+        from pyimeji.ndjson import open_output, export
+
+        with HTTMock(paged_items, imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            for name, opener in [('items.ndjson', open), ('items.ndjson.gz', gzip.open)]:
+                path = os.path.join(self.tmp, name)
+                with open_output(path) as fp:
+                    export(collection, fp)
+                with opener(path, 'rb') as fp:
+                    self.assertEqual(len(fp.read().splitlines()), len(PAGED_ITEMS))
+
+    def test_cli(self):
+        from pyimeji.cli import main
+
+        path = os.path.join(self.tmp, 'album.ndjson')
+        with HTTMock(paged_items, imeji):
+            main([
+                '--service=%s' % SERVICE_URL,
+                'export', 'album', 'MAlOuZ4Y9iDR_', '--output=%s' % path, '--gzip'])
+        with gzip.open(path, 'rb') as fp:
+            self.assertEqual(json.loads(fp.readline().decode('utf8'))['id'], 'item000')
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        from pyimeji.api import Imeji
+
+        self.tmp = mkdtemp()
+        self.api = Imeji(service_url=SERVICE_URL)
+        self.created = []
+        self.path = os.path.join(self.tmp, 'items.ndjson.gz')
+        with gzip.open(self.path, 'wb') as fp:
+            for i, d in enumerate(PAGED_ITEMS[:20]):
+                if i == 5:
+                    d = dict(d, metadata='invalid')
+                fp.write(json.dumps(d).encode('utf8') + b'\n')
+                if i == 10:
+                    fp.write(b'\n')
+
+    def tearDown(self):
+        rmtree(self.tmp, ignore_errors=True)
+
+    def _create(self):
+        @urlmatch(path=r'^/rest/items$', method='post')
+        def create(url, request):
+            self.created.append(url)
+            return response(
+                201, dict(RESOURCES['item'], id='new%03d' % len(self.created)),
+                {'content-type': 'application/json'}, None, 5, request)
+        return create
+
+    def test_import_kw(self):
+        from pyimeji.ndjson import _import_kw
+
+        kw = _import_kw(RESOURCES['item'])
+        self.assertNotIn('id', kw)
+        self.assertNotIn('collectionId', kw)
+        self.assertEqual(kw['fetchUrl'], RESOURCES['item']['fileUrl'])
+        self.assertEqual(kw['filename'], RESOURCES['item']['filename'])
+        self.assertNotIn('fetchUrl', _import_kw(dict(RESOURCES['item'], _file='x')))
+
+    def test_import(self):
+        from pyimeji.ndjson import import_items, Journal
+
+        with HTTMock(self._create(), imeji):
+            collection = self.api.collection('FKMxUpYdV9N2J4XG')
+            results = import_items(collection, self.path, workers=2)
+            # Simulate an interrupted import.
+            for i, result in enumerate(results):
+                if i == 7:
+                    break
+            results.close()
+            done = Journal(self.path + '.journal').load()
+            # Records in progress when the import was stopped have been completed.
+            self.assertGreaterEqual(len(done), 7)
+            self.assertEqual(len(self.created), len(done))
+
+            results = list(import_items(collection, self.path, workers=3))
+            self.assertEqual(len(results), 20 - len(done))
+            failed = [r for r in results if not r.ok]
+            self.assertEqual([r.record[0] for r in failed], [6])
+            self.assertEqual(len(self.created), 19)
+
+            self.assertEqual(
+                [r.record[0] for r in import_items(collection, self.path)], [6])
+        done = Journal(self.path + '.journal').load()
+        self.assertEqual(len(done), 19)
+        self.assertEqual(sorted(done.values()), ['new%03d' % i for i in range(1, 20)])
+
+    def test_cli(self):
+        from pyimeji.cli import main
+
+        with HTTMock(self._create(), imeji):
+            res = main([
+                '--service=%s' % SERVICE_URL, 'import', 'FKMxUpYdV9N2J4XG', self.path,
+                '--journal=%s' % os.path.join(self.tmp, 'journal')])
+        self.assertIsInstance(res, Exception)
+        self.assertEqual(len(self.created), 19)
@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+import threading
+import time
+from unittest import TestCase
+
+from httmock import HTTMock
+from six.moves.BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn
+
+from pyimeji.tests.test_api import SERVICE_URL, imeji
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(0.05)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class PoolTest(TestCase):
+    def test_pool_wait(self):
+        import requests
+        from pyimeji.pool import PooledAdapter
+
+        server = _Server(('127.0.0.1', 0), _Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = 'http://127.0.0.1:%s/' % server.server_address[1]
+        try:
+            session = requests.Session()
+            adapter = PooledAdapter(pool_maxsize=1, pool_block=True)
+            session.mount('http://', adapter)
+            threads = [threading.Thread(target=session.get, args=(url,)) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(adapter.stats.checkouts, 4)
+        # With a single connection, requests had to wait for each other.
+        self.assertGreater(adapter.stats.max_wait, 0.04)
+        self.assertGreater(adapter.stats.as_dict()['wait'], adapter.stats.mean_wait)
+
+    def test_settings(self):
+        from pyimeji.api import Imeji
+        from pyimeji.config import Config
+
+        cfg = Config()
+        cfg.add_section('service')
+        cfg.set('service', 'pool_maxsize', '32')
+        cfg.set('service', 'pool_block', 'true')
+        cfg.set('service', 'keep_alive', 'false')
+        cfg.set('service', 'read_timeout', '30')
+        with HTTMock(imeji):
+            api = Imeji(cfg, service_url=SERVICE_URL)
+            adapter = api.session.get_adapter(SERVICE_URL)
+            self.assertEqual(adapter._pool_maxsize, 32)
+            self.assertTrue(adapter._pool_block)
+            self.assertEqual(api.session.headers['Connection'], 'close')
+            self.assertEqual(api.timeout, (None, 30.0))
+            self.assertIs(adapter.stats, api.pool_stats)
+
+            api = Imeji(cfg, service_url=SERVICE_URL, pool_maxsize=4, keep_alive=True, timeout=5)
+            self.assertEqual(api.session.get_adapter(SERVICE_URL)._pool_maxsize, 4)
+            self.assertEqual(api.session.headers['Connection'], 'keep-alive')
+            self.assertEqual(api.timeout, 5)
+            self.assertIn('Wo1JI_oZNyrfxV_t', api.items())
@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+import time
+from unittest import TestCase
+
+import requests
+from httmock import urlmatch, response, HTTMock
+
+from pyimeji.tests.test_api import SERVICE_URL, RESOURCES, imeji
+
+
+class RetryTest(TestCase):
+    def test_retry_after(self):
+        from email.utils import formatdate
+        from pyimeji.retry import retry_after
+
+        self.assertEqual(retry_after('120'), 120)
+        self.assertIsNone(retry_after(None))
+        self.assertIsNone(retry_after('soon'))
+        now = time.time()
+        self.assertAlmostEqual(
+            retry_after(formatdate(now + 60, usegmt=True), now=now), 60, delta=1)
+
+    def test_policy(self):
+        from pyimeji.retry import RetryPolicy
+
+        policy = RetryPolicy(retries=2, backoff=1, max_backoff=3)
+        self.assertTrue(policy.retryable('GET', 1))
+        self.assertTrue(policy.retryable('put', 2, 503))
+        self.assertFalse(policy.retryable('get', 3, 503))
+        self.assertFalse(policy.retryable('get', 1, 500))
+        self.assertFalse(policy.retryable('post', 1))
+        for attempt in range(1, 6):
+            self.assertLessEqual(policy.delay(attempt), min(3, 2 ** (attempt - 1)))
+        self.assertEqual(policy.delay(1, retry_after=10), 10)
+
+    def test_circuit_breaker(self):
+        from pyimeji.retry import CircuitBreaker
+
+        breaker = CircuitBreaker(threshold=2, reset=0.05)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertTrue(breaker.open)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        # A single trial request is let through ...
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        # ... and re-opens the circuit if it fails.
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertFalse(breaker.open)
+        self.assertTrue(breaker.allow())
+
+
+class ApiRetryTest(TestCase):
+    def setUp(self):
+        from pyimeji.api import Imeji
+        from pyimeji.retry import RetryPolicy, CircuitBreaker
+
+        self.failures = []
+        with HTTMock(imeji):
+            self.api = Imeji(
+                service_url=SERVICE_URL,
+                retry=RetryPolicy(retries=2, backoff=0),
+                circuit_breaker=CircuitBreaker(threshold=4, reset=60))
+
+    def _flaky(self, failures):
+        @urlmatch(path=r'^/rest/items/Wo1JI_oZNyrfxV_t$')
+        def flaky(url, request):
+            self.failures.append(request.method)
+            if len(self.failures) <= failures:
+                if len(self.failures) % 2:
+                    raise requests.ConnectionError('connection reset')
+                return response(503, b'', {'Retry-After': '0'}, None, 5, request)
+            return response(
+                200, RESOURCES['item'], {'content-type': 'application/json'}, None, 5, request)
+        return flaky
+
+    def test_retry(self):
+        from pyimeji.api import ImejiError
+
+        with HTTMock(self._flaky(2), imeji):
+            self.assertEqual(self.api.item('Wo1JI_oZNyrfxV_t').id, 'Wo1JI_oZNyrfxV_t')
+        self.assertEqual(len(self.failures), 3)
+        self.assertFalse(self.api.circuit_breaker.failures)
+
+        self.failures = []
+        with HTTMock(self._flaky(3), imeji):
+            self.assertRaises(ImejiError, self.api.item, 'Wo1JI_oZNyrfxV_t')
+        self.assertEqual(len(self.failures), 3)
+
+    def test_circuit_breaker(self):
+        from pyimeji.api import CircuitOpenError
+
+        with HTTMock(self._flaky(100), imeji):
+            self.assertRaises(Exception, self.api.item, 'Wo1JI_oZNyrfxV_t')
+            self.assertRaises(CircuitOpenError, self.api.item, 'Wo1JI_oZNyrfxV_t')
+        self.assertEqual(len(self.failures), 4)
+
+    def test_no_retry(self):
+        from pyimeji.api import Imeji, ImejiError
+
+        with HTTMock(imeji):
+            api = Imeji(service_url=SERVICE_URL, retry=False, circuit_breaker=False)
+        with HTTMock(self._flaky(1), imeji):
+            self.assertRaises(ImejiError, api.item, 'Wo1JI_oZNyrfxV_t')
+        self.assertEqual(len(self.failures), 1)
+
+    def test_health_check(self):
+        from pyimeji.api import Imeji, ImejiError, CircuitOpenError, _health_checked
+        from pyimeji.retry import RetryPolicy, CircuitBreaker
+
+        heads = []
+
+        @urlmatch(method='head')
+        def down(url, request):
+            heads.append(url)
+            raise requests.ConnectionError('connection refused')
+
+        with HTTMock(imeji):
+            api = Imeji(
+                service_url=SERVICE_URL,
+                timeout=(2, 30),
+                retry=RetryPolicy(retries=1, backoff=0),
+                circuit_breaker=CircuitBreaker(threshold=4, reset=60))
+        self.assertEqual(api.health_check_timeout, 2)
+        _health_checked.pop(SERVICE_URL, None)
+        with HTTMock(down, imeji):
+            self.assertRaises(ImejiError, api.items)
+            self.assertEqual(len(heads), 2)
+            self.assertRaises(ImejiError, api.items)
+            self.assertRaises(CircuitOpenError, api.items)
+        self.assertEqual(len(heads), 4)
+        self.assertEqual(api.circuit_breaker.failures, 4)
+        self.assertEqual(Imeji(service_url=SERVICE_URL).health_check_timeout, 5)
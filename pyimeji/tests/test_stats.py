@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+import threading
+from unittest import TestCase
+
+from httmock import HTTMock, all_requests
+
+from pyimeji.tests.test_api import SERVICE_URL, imeji
+
+
+class StatsTest(TestCase):
+    def test_endpoint(self):
+        from pyimeji.stats import endpoint
+
+        for uri, res in [
+            ('http://example.org/rest/collections', '/collections'),
+            ('http://example.org/rest/collections/abc?q=x', '/collections/{id}'),
+            ('http://example.org/imeji/rest/albums/abc/members/link', '/albums/{id}/members/link'),
+            ('http://example.org/rest/collections/abc/items/template',
+             '/collections/{id}/items/template'),
+            ('http://example.org/rest/albums/abc/items/def', '/albums/{id}/items/{id}'),
+            ('http://example.org/file/image.jpg?x=1', '/file/image.jpg'),
+        ]:
+            self.assertEqual(endpoint(uri), res)
+
+    def test_histogram(self):
+        from pyimeji.stats import Histogram
+
+        h = Histogram()
+        self.assertEqual(h.quantile(0.5), 0.0)
+        for seconds in [0.002] * 90 + [0.3] * 9 + [12]:
+            h.add(seconds)
+        d = h.as_dict()
+        self.assertEqual(d['count'], 100)
+        self.assertEqual(d['p50'], 0.0025)
+        self.assertEqual(d['p90'], 0.0025)
+        self.assertEqual(d['p99'], 0.5)
+        self.assertEqual(d['max'], 12)
+        self.assertEqual(sum(n for _, n in d['buckets']), 100)
+
+    def test_api_stats(self):
+        from pyimeji.api import Imeji, ImejiError
+
+        headers, bodies = [], []
+
+        @all_requests
+        def check_headers(url, request):
+            headers.append(request.headers.get('X-Trace'))
+            bodies.append(request.body)
+            return imeji(url, request)
+
+        api = Imeji(service_url=SERVICE_URL, cache=True, retry=False)
+        records = []
+        api.add_hook('before_request', lambda record, kw: kw.update(headers={'X-Trace': '1'}))
+        api.add_hook('after_request', records.append)
+        with HTTMock(check_headers):
+            api.collection('FKMxUpYdV9N2J4XG')
+            api.collection('FKMxUpYdV9N2J4XG')
+            api.collection('FKMxUpYdV9N2J4XG').release()
+            self.assertRaises(ImejiError, api.item, 'unknown')
+            api.album('MAlOuZ4Y9iDR_').discard('no longer needed')
+
+        self.assertEqual(len(records), 7)
+        # Form data is measured as sent.
+        self.assertEqual(records[-1].bytes_out, len(bodies[-1]))
+        self.assertTrue(records[1].cached)
+        self.assertIsInstance(records[-3].error, ImejiError)
+        self.assertIn('1', headers)
+        stats = api.stats()
+        get = stats['requests']['GET /collections/{id}']
+        self.assertEqual(get['count'], 3)
+        self.assertEqual(get['cached'], 2)
+        self.assertEqual(get['statuses'], {200: 1})
+        self.assertGreater(get['bytes_in'], 1000)
+        self.assertEqual(get['latency']['count'], 3)
+        self.assertEqual(get['phases']['decode']['count'], 1)
+        self.assertEqual(stats['requests']['PUT /collections/{id}/release']['count'], 1)
+        self.assertEqual(stats['requests']['GET /items/{id}']['errors'], 1)
+        self.assertEqual(stats['cache']['hits'], 2)
+        self.assertIn('checkouts', stats['pool'])
+        api.request_stats.reset()
+        self.assertEqual(api.stats()['requests'], {})
+
+    def test_phases(self):
+        from pyimeji.api import Imeji
+        from pyimeji.tests.test_pool import _Server, _Handler
+
+        server = _Server(('127.0.0.1', 0), _Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            api = Imeji(
+                service_url='http://127.0.0.1:%s' % server.server_address[1],
+                health_check=False)
+            for _ in range(3):
+                api._req('/items/abc')
+        finally:
+            server.shutdown()
+            server.server_close()
+        stats = api.stats()['requests']['GET /items/{id}']
+        self.assertEqual(stats['statuses'], {200: 3})
+        self.assertEqual(stats['bytes_in'], 6)
+        phases = stats['phases']
+        self.assertGreater(phases['connect']['max'], 0)
+        self.assertGreaterEqual(phases['server']['mean'], 0.04)
+        self.assertEqual(api.stats()['pool']['checkouts'], 3)
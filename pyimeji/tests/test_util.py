@@ -20,8 +20,73 @@ class Tests(TestCase):
             'ok')
 
     def test_jsondumps(self):
-        from pyimeji.util import jsonload, jsondumps
-        object_test = jsonload(os.path.join(os.path.dirname(__file__), 'test.json'))
-        self.assertIsNotNone(jsondumps(object_test))
-        self.assertEqual(jsondumps(object_test),
-                         open(os.path.join(os.path.dirname(__file__), 'test.json'), mode='rb').read())
+        from pyimeji.util import jsonload, jsondumps, set_json_backend
+
+        set_json_backend('json')
+        try:
+            object_test = jsonload(os.path.join(os.path.dirname(__file__), 'test.json'))
+            self.assertIsNotNone(jsondumps(object_test))
+            self.assertEqual(
+                jsondumps(object_test),
+                open(os.path.join(os.path.dirname(__file__), 'test.json'), mode='rb').read())
+        finally:
+            set_json_backend()
+
+    def test_json_backends(self):
+        from pyimeji.util import JSON_BACKENDS, set_json_backend, json_backend, loads, dumps
+
+        obj = {'title': '\u00e4\u20ac', 'size': [1, 2.5, None, True]}
+        try:
+            for name in JSON_BACKENDS:
+                try:
+                    self.assertEqual(set_json_backend(name), name)
+                except ImportError:  # pragma: no cover
+                    continue
+                self.assertEqual(json_backend()[0], name)
+                self.assertEqual(loads(dumps(obj)), obj)
+                self.assertEqual(loads(dumps(obj).encode('utf8')), obj)
+                self.assertIn('\n', dumps(obj, indent=2))
+            self.assertRaises(ImportError, set_json_backend, 'nosuchjson')
+        finally:
+            self.assertIn(set_json_backend(), JSON_BACKENDS)
+
+    def test_client_json_backend(self):
+        from pyimeji.api import Imeji
+        from pyimeji.config import Config
+        from pyimeji.util import json_backend
+
+        default = json_backend()
+        cfg = Config()
+        cfg.add_section('json')
+        cfg.set('json', 'backend', 'json')
+        api = Imeji(cfg, service_url='http://example.org', health_check=False)
+        self.assertEqual(api.json_backend[0], 'json')
+        self.assertIs(json_backend(), default)
+        self.assertIsNone(Imeji(service_url='http://example.org', health_check=False).json_backend)
+
+    def test_parse_date(self):
+        from dateutil.parser import parse
+        from pyimeji.util import parse_date
+
+        for s in [
+            '2014-10-09T13:01:25 +0200',
+            '2014-10-09T13:01:25-0530',
+            '2014-10-09T13:01:25.123+01:00',
+            '2014-10-09T13:01:25Z',
+            '2014-10-09T13:01:25',
+            '2014-10-09 13:01:25',
+            '9 Oct 2014 13:01',
+        ]:
+            self.assertEqual(parse_date(s), parse(s))
+            self.assertEqual(parse_date(s).utcoffset(), parse(s).utcoffset())
+        self.assertRaises(ValueError, parse_date, '2014-10-16T11:15:97 +0200')
+
+    def test_parse_dates(self):
+        from pyimeji.util import parse_date, parse_dates
+
+        dates = parse_dates(
+            [{'modifiedDate': '2014-10-09T13:01:25 +0200'}, {},
+             {'modifiedDate': '2014-10-09T13:01:25 +0200'}])
+        self.assertEqual(dates[0], parse_date('2014-10-09T13:01:25 +0200'))
+        self.assertIsNone(dates[1])
+        self.assertIs(dates[0], dates[2])
@@ -1,6 +1,9 @@
 import os
+import re
 import json
 import io
+import importlib
+from datetime import datetime
 
 from six import PY3
 
@@ -11,11 +14,84 @@ def pkg_path(*comps):
     return os.path.join(os.path.dirname(pyimeji.__file__), *comps)
 
 
+#: JSON libraries in order of preference, when auto-detecting the JSON backend.
+JSON_BACKENDS = ['orjson', 'ujson', 'json']
+_json_backend = []
+
+
+def load_json_backend(name='auto'):
+    """Import the library to encode and decode JSON with.
+
+    :param name: One of :py:data:`JSON_BACKENDS` or "auto" to select the first one which \
+    is installed.
+    :return: Pair (name, module).
+    """
+    for backend in JSON_BACKENDS if name == 'auto' else [name]:
+        try:
+            return [backend, importlib.import_module(backend)]
+        except ImportError:
+            if name != 'auto':
+                raise
+
+
+def set_json_backend(name='auto'):
+    """Select the library used by default - i.e. for all clients which do not configure one
+    - to encode and decode JSON.
+
+    :param name: See :py:func:`load_json_backend`.
+    :return: The name of the selected backend.
+    """
+    _json_backend[:] = load_json_backend(name)
+    return _json_backend[0]
+
+
+def json_backend():
+    """:return: Pair (name, module) of the default JSON backend."""
+    if not _json_backend:
+        set_json_backend()
+    return _json_backend
+
+
+def loads(s, backend=None):
+    """Decode a JSON document, given as text or UTF-8 encoded bytes.
+
+    :param backend: Pair (name, module) as returned by :py:func:`load_json_backend`, \
+    defaults to :py:func:`json_backend`.
+    """
+    name, module = backend or json_backend()
+    if name == 'json' and isinstance(s, bytes):
+        # The json module of python < 3.6 only decodes text.
+        s = s.decode('utf8')
+    return module.loads(s)
+
+
+def dumps(obj, backend=None, **kw):
+    """Encode an object as JSON text.
+
+    Keyword parameters - e.g. `sort_keys` or `indent` - are only understood by the stdlib
+    `json` module, which is used if any are passed.
+
+    :param backend: See :py:func:`loads`.
+    """
+    name, module = backend or json_backend()
+    if kw or name == 'json':
+        return json.dumps(obj, **kw)
+    try:
+        res = module.dumps(obj)
+    except (TypeError, OverflowError):  # pragma: no cover
+        # e.g. orjson does not serialize dicts with non-string keys.
+        return json.dumps(obj)
+    return res.decode('utf8') if isinstance(res, bytes) else res
+
+
 def jsonload(path, **kw):
     """python 2 + 3 compatible version of json.load.
 
     :return: The python object read from path.
     """
+    if not kw:
+        with io.open(path, 'rb') as fp:
+            return loads(fp.read())
     _kw = {}
     if PY3:  # pragma: no cover
         _kw['encoding'] = 'utf8'
@@ -25,6 +101,76 @@ def jsonload(path, **kw):
 
 def jsondumps(obj):
     if PY3:
-        return json.dumps(obj).encode('utf8')
+        return dumps(obj).encode('utf8')
     else:
-        return json.dumps(obj)
+        return dumps(obj)
+
+
+DATE_PATTERN = re.compile(
+    r'(?P<year>\d{4})-(?P<month>\d\d)-(?P<day>\d\d)'
+    r'[T ](?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d\d)(?:\.(?P<fraction>\d{1,6}))?'
+    r'\s*(?:(?P<utc>Z)|(?P<sign>[+-])(?P<tzhour>\d\d):?(?P<tzminute>\d\d))?$')
+_TZ = {}
+
+
+def _tz(seconds):
+    # Timezone objects are shared, and compatible with the ones created by dateutil;
+    # `None` stands for UTC.
+    if seconds not in _TZ:
+        from dateutil.tz import tzoffset, tzutc
+
+        _TZ[seconds] = tzoffset(None, seconds) if seconds is not None else tzutc()
+    return _TZ[seconds]
+
+
+def parse_date(s):
+    """Parse a timestamp as formatted by imeji, e.g. "2014-10-09T13:01:25 +0200".
+
+    Timestamps in this (ISO 8601) format are parsed with a regular expression; anything
+    else is handed over to `dateutil.parser.parse`.
+
+    :rtype: datetime.datetime
+    """
+    m = DATE_PATTERN.match(s)
+    if m:
+        try:
+            if m.group('utc'):
+                tz = _tz(None)
+            elif m.group('sign'):
+                tz = _tz((1 if m.group('sign') == '+' else -1) * (
+                    int(m.group('tzhour')) * 3600 + int(m.group('tzminute')) * 60))
+            else:
+                tz = None
+            return datetime(
+                int(m.group('year')), int(m.group('month')), int(m.group('day')),
+                int(m.group('hour')), int(m.group('minute')), int(m.group('second')),
+                int((m.group('fraction') or '0').ljust(6, '0')),
+                tzinfo=tz)
+        except ValueError:
+            pass
+    from dateutil.parser import parse
+
+    return parse(s)
+
+
+def parse_dates(entries, field='modifiedDate'):
+    """Parse the timestamps of one field for all entries of a listing.
+
+    Identical timestamps - common in listings of objects created in bulk - are parsed only
+    once.
+
+    :param entries: Iterable of metadata dicts.
+    :param field: Name of the timestamp field.
+    :return: List of `datetime.datetime` objects (or `None` for entries without the field).
+    """
+    parsed = {}
+    res = []
+    for d in entries:
+        value = d.get(field)
+        if value is None:
+            res.append(None)
+            continue
+        if value not in parsed:
+            parsed[value] = parse_date(value)
+        res.append(parsed[value])
+    return res
@@ -9,6 +9,7 @@ requires = [
     'AppDirs',
     'python-dateutil',
     'sphinx_rtd_theme',
+    'futures; python_version < "3.0"',
 ]
 
 
@@ -27,6 +28,7 @@ setup(
     author_email='support@imeji.org',
     url='https://github.com/imeji-community/pyimeji',
     install_requires=requires,
+    extras_require={'async': ['aiohttp'], 'fastjson': ['orjson']},
     license=read("LICENSE"),
     zip_safe=False,
     keywords='imeji',